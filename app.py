@@ -1,26 +1,586 @@
 from functions import *
 import streamlit as st
+import re
 import datetime
+import threading
+import pandas as pd
 import warnings
 import altair as alt
 import plotly.express as px
 import functions
+import chat_cache
+import instrumentation
 
 warnings.filterwarnings("ignore")
 
 st.set_page_config(page_title="WhatsApp Group Chat Analysis")
 
+# a change of a widget inside a fragment reruns only that fragment instead of the whole page
+# (st.experimental_fragment before Streamlit 1.37, on older versions every change reruns the page as before)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda function: function)
+
+# images of the running page that are waited for at its end, one list per script thread
+_pending_images = threading.local()
+
+WEEKDAYS_NOTE_TR = """Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar"""
+
+# texts of the analysis pages in every language
+TEXTS = {
+    "English": {
+        "title": "WhatsApp Group Chat Analysis",
+        "model_title": "Sample Model Application",
+        "upload_title": "Do Your Own Analysis",
+        "compare_title": "Compare Chats",
+        "group": "All Group Statistic",
+        "group_stats": "General Statistics of the Group",
+        "history": "Conversation History Plot",
+        "history_level": "Resolution",
+        "history_levels": {"auto": "Auto", "day": "Day", "week": "Week", "month": "Month"},
+        "top_n": "Top N Days and Users",
+        "top_days": "Top N Days",
+        "top_users": "Top N Users",
+        "n_days_input": "Enter the number of days you want to see",
+        "n_users_input": "Enter the number of users you want to see",
+        "hours": "Most Active Hours",
+        "weekdays": "Most Active Days",
+        "heatmap": "Heatmap of Day-Hour",
+        "sessions": "Conversations",
+        "session_gap": "Minutes of silence that end a conversation",
+        "session_stats": {
+            "n_sessions": "Number of Conversations:",
+            "avg_duration": "Avg. Duration (min):",
+            "avg_messages": "Avg. Messages per Conversation:",
+            "max_duration": "Longest Conversation (min):",
+        },
+        "starters": "Who Starts the Conversations",
+        "reply_times": "Reply Times (minutes)",
+        "sessions_note": None,
+        "replies": "Who Replies to Whom",
+        "reply_window": "Minutes within which the next message counts as a reply",
+        "replies_note": "Rows are the users who reply, columns are the users they reply to.",
+        "top_pairs": "Top Reply Pairs",
+        "reply_degrees": "Replies Written (out) and Received (in)",
+        "links": "Links, Emoji and Mentions",
+        "link_stats": {
+            "n_links": "Number of Links:",
+            "n_emoji": "Number of Emoji:",
+            "n_mentions": "Number of Mentions:",
+        },
+        "top_domains": "Most Shared Sites",
+        "top_emoji": "Most Used Emoji",
+        "top_sharers": "Links, Emoji and Mentions per User",
+        "group_cloud": "Word-Cloud of Group",
+        "cloud_note": "Note: Turkish stopwords were removed in this process.",
+        "user": "Selected User Statistic",
+        "select_user": "Select Username",
+        "user_stats": "General Statistics of the Selected User",
+        "user_top_days": "Top N Days",
+        "user_top_days_graph": "Top N Days Graph",
+        "n_user_days_input": "Enter the number of days you want to see for user",
+        "user_cloud": "Word-Cloud of the User",
+        "longest_message": "*The Longest Message*",
+        "period": "Date Range",
+        "no_messages": "There is no message in the selected date range.",
+        "empty_chat": "No message could be found in the chat. Please check the date format selected in the sidebar.",
+        "top_words": "Most Used Words",
+        "days_note": None,
+        "users_note": None,
+        "weekdays_note": None,
+        "stats": {
+            "n_days": "Number of Days:",
+            "n_users": "Number of Users:",
+            "n_messages": "Number of Messages:",
+            "n_words": "Number of Words:",
+            "avg_message_per_user": "Avg. Messages per User:",
+            "avg_message_per_day": "Avg. Messages per Day:",
+            "avg_words": "Avg. Len. of Msgs. (word):",
+            "avg_len_message": "Avg Len. Of Msgs. (char):",
+            "min_word_message": "Min. Len. Of Msgs (word): ",
+            "max_word_message": "Max. Len. of Msgs (word):",
+            "min_len_message": "Min. Len. of Msgs (char):",
+            "max_len_message": "Max. Len. of Msgs (char):",
+            "user_max_len_message": "User Who Wrote the Longest:",
+        },
+        "user_stat_labels": {
+            "n_days": "Number of Days:",
+            "n_messages": "Number of Messages:",
+            "avg_message_per_day": "Avg. Msgs. per Day:",
+            "n_words": "Number of Words:",
+            "avg_words_per_message": "Avg. Words per Msgs.:",
+            "min_len_message": "Min. Len. of Msgs (char):",
+            "max_len_message": "Max. Len. of Msgs (char):",
+            "avg_len_message": "Avg. Len. of Msgs (char):",
+            "min_word_message": "Min. Len. of Msgs (word):",
+            "max_word_message": "Max. Len. of Msgs (word):",
+            "avg_words": "Avg. Len. of Msgs (word):",
+        },
+        "upload": "Upload a group chat txt or zip file:",
+        "select_format": "What is the date format?",
+        "auto_format": "Auto-detect",
+        "format_directives": {"%d": "DD", "%m": "MM", "%Y": "YYYY", "%y": "YY", "%H": "HH", "%I": "HH", "%M": "MM",
+                              "%S": "SS", "%p": "AM"},
+        "format_error": "The date format of the file could not be read. Please select the date format from the sidebar.",
+        "compare_upload": "Upload group chat txt or zip files:",
+        "parsing": "Parsing {} chats...",
+        "read_error": "{} could not be read: {}",
+        "compare_stats": "General Statistics of the Chats",
+        "daily_activity": "Daily Activity",
+        "compare_top_users": "Top Users Across the Chats",
+        "n_compare_users_input": "Enter the number of users you want to see",
+    },
+    "Türkçe": {
+        "title": "WhatsApp Sohbet Analizi",
+        "model_title": "Örnek Proje Uygulaması",
+        "upload_title": "Kendi Analizinizi Yapın",
+        "compare_title": "Sohbetleri Karşılaştır",
+        "group": "Toplu Grup Analizi",
+        "group_stats": "Grubun Genel İstatistikleri",
+        "history": "Konuşma Geçmişi Grafiği",
+        "history_level": "Çözünürlük",
+        "history_levels": {"auto": "Otomatik", "day": "Gün", "week": "Hafta", "month": "Ay"},
+        "top_n": "En Aktif Günler ve Kullanıcılar",
+        "top_days": "En Aktif Günler",
+        "top_users": "En Aktif Kullanıcılar",
+        "n_days_input": "Kaç gün görmek istediğinizi seçiniz",
+        "n_users_input": "Kaç kullanıcı görmek istediğinizi seçiniz",
+        "hours": "En Aktif Saatler",
+        "weekdays": "En Aktif Günler",
+        "heatmap": "Gün-Saat Isı Haritası",
+        "sessions": "Sohbetler",
+        "session_gap": "Sohbeti bitiren sessizlik süresi (dakika)",
+        "session_stats": {
+            "n_sessions": "Sohbet Sayısı:",
+            "avg_duration": "Ort. Süre (dakika):",
+            "avg_messages": "Sohbet Başına Ort. Mesaj:",
+            "max_duration": "En Uzun Sohbet (dakika):",
+        },
+        "starters": "Sohbeti Kim Başlatıyor",
+        "reply_times": "Cevap Süreleri (dakika)",
+        "sessions_note": "n_started: başlattığı sohbet sayısı & n_replies: cevap sayısı & median_reply: ortanca cevap süresi & mean_reply: ortalama cevap süresi",
+        "replies": "Kim Kime Cevap Veriyor",
+        "reply_window": "Sonraki mesajın cevap sayıldığı süre (dakika)",
+        "replies_note": "Satırlar cevap veren, sütunlar cevap verilen kullanıcılardır. replied_to: cevap verilen & n_replies: cevap sayısı & out_degree: yazdığı cevaplar & in_degree: aldığı cevaplar",
+        "top_pairs": "En Çok Cevaplaşanlar",
+        "reply_degrees": "Yazılan (out) ve Alınan (in) Cevaplar",
+        "links": "Bağlantılar, Emojiler ve Etiketlemeler",
+        "link_stats": {
+            "n_links": "Bağlantı Sayısı:",
+            "n_emoji": "Emoji Sayısı:",
+            "n_mentions": "Etiketleme Sayısı:",
+        },
+        "top_domains": "En Çok Paylaşılan Siteler",
+        "top_emoji": "En Çok Kullanılan Emojiler",
+        "top_sharers": "Kişi Başına Bağlantı, Emoji ve Etiketlemeler",
+        "group_cloud": "Grubun Kelime Bulutu",
+        "cloud_note": "Not: Türkçe stopwords (Bu, şu vb.) kelimeler çıkartılmıştır.",
+        "user": "Seçilen Kullanıcı İstatistikleri",
+        "select_user": "Kullanıcı Seçiniz",
+        "user_stats": "Kullanıcının Genel İstatistikleri",
+        "user_top_days": "En Aktif Günler",
+        "user_top_days_graph": "En Aktif Günler Grafiği",
+        "n_user_days_input": "Kullanıcı için görmek istediğiniz gün sayısını giriniz",
+        "user_cloud": "Kullanıcının Kelime Bulutu",
+        "longest_message": "*En Uzun Mesaj*",
+        "period": "Tarih Aralığı",
+        "no_messages": "Seçilen tarih aralığında mesaj yok.",
+        "empty_chat": "Sohbette hiç mesaj bulunamadı. Lütfen kenar çubuğunda seçilen tarih formatını kontrol ediniz.",
+        "top_words": "En Çok Kullanılan Kelimeler",
+        "days_note": "date: gün & message_count: mesaj sayısı",
+        "users_note": "user: kullanıcı & message_count: mesaj sayısı",
+        "weekdays_note": WEEKDAYS_NOTE_TR,
+        "stats": {
+            "n_days": "Gün Sayısı:",
+            "n_users": "Kullanıcı Sayısı:",
+            "n_messages": "Mesaj Sayısı:",
+            "n_words": "Kelime Sayısı:",
+            "avg_message_per_user": "Kullanıcı Başına Ort. Mesaj:",
+            "avg_message_per_day": "Gün Başına Ort. Mesaj:",
+            "avg_words": "Ort. Mesaj Uzun. (kelime):",
+            "avg_len_message": "Ort. Mesaj Uzun. (karakter):",
+            "min_word_message": "En Kısa Msj. Uzun. (kelime): ",
+            "max_word_message": "En Uzun Msj. Uzun. (kelime):",
+            "min_len_message": "En Kısa Msj. Uzun. (karakter):",
+            "max_len_message": "En Uzun Msj. Uzun. (karakter):",
+            "user_max_len_message": "En Uzun Mesajı Yazan:",
+        },
+        "user_stat_labels": {
+            "n_days": "Gün Sayısı:",
+            "n_messages": "Mesaj Sayısı:",
+            "avg_message_per_day": "Gün Başına Ort. Mesaj:",
+            "n_words": "Kelime Sayısı:",
+            "avg_words_per_message": "Msj. Başına Ort. Kelime:",
+            "min_len_message": "En Kısa Msj. Uzun. (karakter):",
+            "max_len_message": "En Uzun Msj. Uzun. (karakter):",
+            "avg_len_message": "Ort. Mesaj Uzunluğu (karakter):",
+            "min_word_message": "En Kısa Msj. Uzun. (kelime):",
+            "max_word_message": "En Uzun Msj. Uzun. (kelime):",
+            "avg_words": "Ort. Mesaj Uzunluğu (kelime):",
+        },
+        "upload": "Sohbet metin (txt) veya zip dosyası yükleyin:",
+        "select_format": "Tarih formatını seçiniz:",
+        "auto_format": "Otomatik Algıla",
+        "format_directives": {"%d": "GG", "%m": "AA", "%Y": "YYYY", "%y": "YY", "%H": "SS", "%I": "SS", "%M": "DD",
+                              "%S": "SN", "%p": "ÖÖ"},
+        "format_error": "Dosyanın tarih formatı okunamadı. Lütfen tarih formatını kenar çubuğundan seçiniz.",
+        "compare_upload": "Sohbet metin (txt) veya zip dosyalarını yükleyin:",
+        "parsing": "{} sohbet okunuyor...",
+        "read_error": "{} okunamadı: {}",
+        "compare_stats": "Sohbetlerin Genel İstatistikleri",
+        "daily_activity": "Günlük Aktivite",
+        "compare_top_users": "Tüm Sohbetlerde En Çok Mesaj Atanlar",
+        "n_compare_users_input": "Görmek istediğiniz kullanıcı sayısını giriniz",
+    },
+}
+
+
+def format_options(texts):
+    """
+    Label -> key of DATETIME_FORMATS of every time format of the selectbox, auto-detect first (eg. "DD/MM/YY, HH:MM AM")
+    """
+    options = {texts["auto_format"]: "auto"}
+    for time_format, datetime_format in functions.DATETIME_FORMATS.items():
+        label = re.sub("%[a-zA-Z]", lambda directive: texts["format_directives"][directive.group()], datetime_format)
+        options[label.rstrip(" -")] = time_format
+    return options
+
+
+def show_metrics(labels, values, rows):
+    """
+    Metrics in rows of equal columns, rows is a list of lists of the keys of labels and values
+    """
+    for row in rows:
+        for column, name in zip(st.columns([5] * len(row)), row):
+            column.metric(labels[name], values[name])
+
+
+def show_general_stats(chat, texts, period, user=None):
+    # the whole chat is served by the range counts too, so the number of days always runs from the first to the last
+    # day of the messages shown and the averages per day don't jump when the slider moves
+    stats = chat.period_stats(*(period or (None, None)))
+    if stats is None:
+        st.write(texts["no_messages"])
+        return
+    stats = dict(stats)
+    for name in ["avg_message_per_user", "avg_message_per_day", "avg_words", "avg_len_message"]:
+        stats[name] = "{:.2f}".format(stats[name])
+    show_metrics(texts["stats"], stats, [["n_days", "n_users", "n_messages", "n_words"],
+                                         ["avg_message_per_user", "avg_message_per_day", "avg_words", "avg_len_message"],
+                                         ["min_word_message", "max_word_message", "min_len_message", "max_len_message"]])
+
+    col13, col14, col15, col16 = st.columns([10, 1, 1, 1])
+    col13.metric(texts["stats"]["user_max_len_message"], stats["user_max_len_message"])
+
+    st.write(texts["longest_message"])
+    st.write(chat.df["message"].iat[stats["longest_message"]])
+
+
+def show_user_stats(chat, texts, period, user):
+    if period is None:
+        user_stats = chat.user_summary(user)
+    else:
+        period_users = chat.period_user_stats(*period)
+        if user not in period_users.index:
+            st.write(texts["no_messages"])
+            return
+        user_stats = period_users.loc[user].to_dict()
+    n_days = chat.period_stats(*(period or (None, None)))["n_days"]  # the days of the group stats (see show_general_stats)
+    stats = dict(user_stats, n_days=n_days,
+                 avg_message_per_day="{:.2f}".format(user_stats["n_messages"] / n_days),
+                 avg_words_per_message="{:.2f}".format(user_stats["n_words"] / user_stats["n_messages"]),
+                 avg_len_message="{:.2f}".format(user_stats["avg_len_message"]),
+                 avg_words="{:.2f}".format(user_stats["avg_words"]))
+    for name in ["n_messages", "n_words", "min_len_message", "max_len_message", "min_word_message", "max_word_message"]:
+        stats[name] = int(stats[name])
+    show_metrics(texts["user_stat_labels"], stats, [["n_days", "n_messages", "avg_message_per_day", "n_words", "avg_words_per_message"],
+                                                    ["min_len_message", "max_len_message", "avg_len_message"],
+                                                    ["min_word_message", "max_word_message", "avg_words"]])
+
+    st.write(texts["longest_message"])
+    st.write(chat.df["message"].iat[int(user_stats["longest_message"])])
+
+
+def show_history(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    # the day, week and month counts are built once per chat, switching the resolution only picks another one
+    pyramid = chat.history(user)
+    level = st.radio(texts["history_level"], list(texts["history_levels"]), format_func=texts["history_levels"].get,
+                     horizontal=True, key="history_level_group" if user is None else "history_level_user")
+    if level == "auto":
+        level = functions.history_level(pyramid, start=start, end=end)  # the finest one that isn't too dense for the plot
+    # Create a line plot about number of messages based days (or weeks or months)
+    st.line_chart(functions.history_range(pyramid, level, start, end), use_container_width=True)
+
+
+def show_top_n(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    col1, col2, col3 = st.columns([9.5, 1, 9.5])
+    with col1:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_days"]), unsafe_allow_html=True)
+        n = st.number_input(texts["n_days_input"], min_value=1, max_value=50, value=5, step=1)
+        if texts["days_note"]:
+            st.write(texts["days_note"])
+        st.dataframe(chat.range_totals.top_n_days(n, start, end), width=None)
+
+    with col3:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_users"]), unsafe_allow_html=True)
+        n = st.number_input(texts["n_users_input"], min_value=1, max_value=50, value=5, step=1)
+        if texts["users_note"]:
+            st.write(texts["users_note"])
+        st.dataframe(chat.range_totals.top_n_user(n, start, end), width=None)
+
+
+def show_user_top_days(chat, texts, period, user):
+    start, end = period or (None, None)
+    col1, col2, col3 = st.columns([9.5, 1, 9.5])
+    with col1:
+        n1 = st.number_input(texts["n_user_days_input"], min_value=1, max_value=50, value=5, step=1)
+        if texts["days_note"]:
+            st.write(texts["days_note"])
+        user_df1 = chat.range_totals.top_n_days(n1, start, end, user)
+        st.dataframe(user_df1, width=None)
+
+    with col3:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["user_top_days_graph"]), unsafe_allow_html=True)
+        st.bar_chart(user_df1["message_count"], use_container_width=True)
+
+
+def period_cube(chat, period):
+    return chat.cube if period is None else chat.period_cube(*period)
+
+
+def show_hours(chat, texts, period, user=None):
+    st.bar_chart(functions.cube_hour_counts(period_cube(chat, period), user), use_container_width=True)
+
+
+def show_weekdays(chat, texts, period, user=None):
+    st.bar_chart(functions.cube_weekday_counts(period_cube(chat, period), user), use_container_width=True)
+    if texts["weekdays_note"]:
+        st.write(texts["weekdays_note"])
+
+
+def show_heatmap(chat, texts, period, user=None):
+    fig = px.imshow(functions.cube_day_hour(period_cube(chat, period), user))
+    st.plotly_chart(fig, use_container_width=True)
+    if texts["weekdays_note"]:
+        st.write(texts["weekdays_note"])
+
+
+def show_sessions(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    gap = st.number_input(texts["session_gap"], min_value=1, max_value=24 * 60, value=60, step=5)
+    sessions, users = chat.sessions(pd.Timedelta(minutes=gap), start, end)
+    if sessions.empty:
+        st.write(texts["no_messages"])
+        return
+
+    minutes = sessions["duration"].dt.total_seconds() / 60
+    show_metrics(texts["session_stats"], {"n_sessions": len(sessions), "avg_duration": "{:.1f}".format(minutes.mean()),
+                                          "avg_messages": "{:.2f}".format(sessions["n_messages"].mean()),
+                                          "max_duration": "{:.0f}".format(minutes.max())},
+                 [["n_sessions", "avg_duration", "avg_messages", "max_duration"]])
+
+    col1, col2, col3 = st.columns([9.5, 1, 9.5])
+    with col1:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["starters"]), unsafe_allow_html=True)
+        st.bar_chart(users["n_started"].sort_values(ascending=False, kind="stable"), use_container_width=True)
+
+    with col3:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["reply_times"]), unsafe_allow_html=True)
+        reply_times = users.assign(median_reply=users["median_reply"].dt.total_seconds() / 60,
+                                   mean_reply=users["mean_reply"].dt.total_seconds() / 60).round(1)
+        st.dataframe(reply_times, width=None)
+    if texts["sessions_note"]:
+        st.write(texts["sessions_note"])
+
+
+def show_replies(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    window = st.number_input(texts["reply_window"], min_value=1, max_value=24 * 60, value=10, step=1)
+    graph = chat.reply_graph(pd.Timedelta(minutes=window), start, end)
+    degrees = graph.degrees()
+    # the heatmap shows the users with the most replies, the tables below have everyone
+    users = (degrees["out_degree"] + degrees["in_degree"]).sort_values(ascending=False, kind="stable").index[:REPLY_HEATMAP_USERS]
+    fig = px.imshow(graph.table(users), labels={"x": "replied_to", "y": "user", "color": "n_replies"})
+    st.plotly_chart(fig, use_container_width=True)
+    st.write(texts["replies_note"])
+
+    col1, col2, col3 = st.columns([9.5, 1, 9.5])
+    with col1:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_pairs"]), unsafe_allow_html=True)
+        st.dataframe(graph.top_pairs(10), width=None)
+
+    with col3:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["reply_degrees"]), unsafe_allow_html=True)
+        st.dataframe(degrees.loc[degrees["out_degree"] + degrees["in_degree"] > 0, ["out_degree", "in_degree"]], width=None)
+
+
+def show_links(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    # the counts were taken while parsing (see functions.tokenize_messages) and are summed per day, no message is scanned here
+    show_metrics(texts["link_stats"], chat.range_totals.token_totals(start, end, user), [functions.TOKEN_COUNTS])
+
+    col1, col2, col3 = st.columns([9.5, 1, 9.5])
+    with col1:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_domains"]), unsafe_allow_html=True)
+        st.bar_chart(functions.top_tokens(chat.token_counts("domains", start, end), 10, user), use_container_width=True)
+
+    with col3:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_emoji"]), unsafe_allow_html=True)
+        st.dataframe(functions.top_tokens(chat.token_counts("emoji", start, end), 10, user), width=None)
+
+    if user is None:
+        st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_sharers"]), unsafe_allow_html=True)
+        sharers = chat.range_totals.token_table(start, end)
+        st.dataframe(sharers.sort_values("n_links", ascending=False, kind="stable"), width=None)
+
+
+def show_word_cloud(chat, texts, period, user=None):
+    start, end = period or (None, None)
+    st.write(texts["cloud_note"])
+    top_words = chat.top_words(10, user, start, end)  # a bincount of the token store, like the words of the cloud
+    if top_words.empty:
+        st.write(texts["no_messages"])
+        return
+    # rendered on a worker thread and kept in the cache of chat_cache, shown at the end of the page
+    cloud_image = st.empty()
+    st.markdown("<h4 style='text-align:left;'>{}</h4>".format(texts["top_words"]), unsafe_allow_html=True)
+    st.bar_chart(top_words, use_container_width=True)
+    draw_later(cloud_image, chat_cache.word_cloud_png(chat, user, start=start, end=end))
+
+
+def draw_later(placeholder, future):
+    """
+    Draws the image of a future into its placeholder once the rest of the page is drawn.
+    In a fragment rerun, without a page around it, the image is drawn at once (the cloud is the last part of its section)
+    """
+    images = getattr(_pending_images, "images", None)
+    if images is None:
+        placeholder.image(future.result())
+    else:
+        images.append((placeholder, future))
+
+
+# number of users in the heatmap of who replies to whom
+REPLY_HEATMAP_USERS = 20
+
+# (text key, function, open at the start) of the sections of the group and of the selected user
+GROUP_SECTIONS = [("group_stats", show_general_stats, True), ("history", show_history, False),
+                  ("top_n", show_top_n, False), ("hours", show_hours, False), ("weekdays", show_weekdays, False),
+                  ("heatmap", show_heatmap, False), ("sessions", show_sessions, False),
+                  ("replies", show_replies, False), ("links", show_links, False),
+                  ("group_cloud", show_word_cloud, False)]
+USER_SECTIONS = [("user_stats", show_user_stats, True), ("history", show_history, False),
+                 ("user_top_days", show_user_top_days, False), ("hours", show_hours, False),
+                 ("weekdays", show_weekdays, False), ("heatmap", show_heatmap, False),
+                 ("links", show_links, False), ("user_cloud", show_word_cloud, False)]
+
+
+@fragment
+def section(title, key, show, *args, opened=False):
+    """
+    One section of a page, computed and drawn only while its toggle is on.
+    As a fragment, its toggle and widgets rerun only this section
+    """
+    if st.toggle("**{}**".format(title), value=opened, key=key):
+        show(*args)
+
+
+@fragment
+def user_section(chat, texts, period):
+    """
+    Statistics of the selected user, changing the user reruns only this part of the page
+    """
+    if len(chat.user_stats) == 0:
+        st.write(texts["empty_chat"])
+        return
+    selected_user = st.selectbox(texts["select_user"], chat.user_stats.index.tolist())
+    if st.session_state.get("user_user_cloud"):
+        start_cloud(chat, period, selected_user)
+    for name, show, opened in USER_SECTIONS:
+        if st.toggle("**{}**".format(texts[name]), value=opened, key="user_" + name):
+            show(chat, texts, period, selected_user)
+
+
+def period_slider(chat, texts):
+    """
+    (start, end) dates selected with the date range slider, None while it covers the whole chat
+    """
+    days = chat.range_totals.days
+    if len(days) < 2:
+        return None
+    first, last = pd.Timestamp(days[0]).date(), pd.Timestamp(days[-1]).date()
+    period = st.slider(texts["period"], min_value=first, max_value=last, value=(first, last),
+                       key="period_{}".format(chat.key))
+    return None if period == (first, last) else period
+
+
+def start_cloud(chat, period, user=None):
+    """
+    Starts the render of an open word cloud before the sections are drawn,
+    show_word_cloud then gets the same future from the cache of chat_cache
+    """
+    start, end = period or (None, None)
+    chat_cache.word_cloud_png(chat, user, start=start, end=end)
+
+
+def analysis_page(chat, texts):
+    if len(chat.df) == 0:  # eg. an export with only system messages, none of the sections has anything to show
+        st.write(texts["empty_chat"])
+        return
+    # every section below shows the messages of the selected dates, from the cumulative counts of the chat
+    period = period_slider(chat, texts)
+    if st.session_state.get("group_group_cloud"):
+        start_cloud(chat, period)
+
+    # the word clouds are waited for last, so the rest of the page is already drawn
+    _pending_images.images = []
+    try:
+        st.markdown("<h2 style='text-align:left;'>{}</h2>".format(texts["group"]), unsafe_allow_html=True)
+        for name, show, opened in GROUP_SECTIONS:
+            section(texts[name], "group_" + name, show, chat, texts, period, opened=opened)
+
+        ##########SELECTED USER STATISTICS##########
+
+        st.markdown("<h2 style='text-align:left;'>{}</h2>".format(texts["user"]), unsafe_allow_html=True)
+        user_section(chat, texts, period)
+
+        for placeholder, future in _pending_images.images:
+            placeholder.image(future.result())
+    finally:
+        _pending_images.images = None
+
+
+def show_compare_stats(chats, texts):
+    st.dataframe(functions.compare_general_stats(chats).astype(str), use_container_width=True)
+
+
+def show_daily_activity(chats, texts):
+    st.area_chart(functions.compare_daily_counts(chats), use_container_width=True)
+
+
+def show_compare_top_users(chats, texts):
+    n = st.number_input(texts["n_compare_users_input"], min_value=1, max_value=50, value=10, step=1)
+    top_users = functions.combined_top_n_user(chats, n)
+    st.bar_chart(top_users.drop(columns="total"), use_container_width=True)
+    st.dataframe(top_users, use_container_width=True)
+
+
 selected_language = st.sidebar.selectbox('Select the Language / Dil Seçiniz', ('English', 'Türkçe'))
+texts = TEXTS[selected_language]
 
-tabs = ["How to Use / Nasıl Kullanılır", "Model Application / Örnek Uygulama", "Do Your Own Analysis / Kendi Analizinizi Yapın"]
+tabs = ["How to Use / Nasıl Kullanılır", "Model Application / Örnek Uygulama", "Do Your Own Analysis / Kendi Analizinizi Yapın",
+        "Compare Chats / Sohbetleri Karşılaştır"]
 
 page = st.sidebar.radio("Tabs / Sayfalar", tabs)
 st.sidebar.markdown("""[Anil Sanli - LinkedIn](https://www.linkedin.com/in/anilsanli/)""")
 st.sidebar.markdown("""[Anil Sanli - GitHub](https://github.com/anilsanli)""")
 
-if selected_language == "English":
+# timings of the parse stages of this run, shown in the sidebar when CHAT_PROFILE is set (see instrumentation.py)
+debug_stages = instrumentation.collect().start() if instrumentation.is_enabled() else None
 
-    if page == "How to Use / Nasıl Kullanılır":
+if page == "How to Use / Nasıl Kullanılır":
+
+    if selected_language == "English":
         st.markdown("<h1 style='text-align:center;'>WhatsApp Group Chat Analysis</h1>",unsafe_allow_html=True)
         st.markdown("<h2 style='text-align:center;'>How to Use</h2>", unsafe_allow_html=True)
         st.write("""This project is an application that analyzes whatsapp group chats, visualizes basic statistical information and presents it to the user.""")
@@ -31,329 +591,16 @@ if selected_language == "English":
         st.write("""To use the application;""")
         st.write("""1. You have to export the WhatsApp Group Chat (without media option is preferred)""")
         st.write("""2. You should check the date format on exported text file""")
-        st.write("""* If the format is *DD.MM.YYYY HH:MM*, you should choose first button.""")
-        st.write("""* If the format is *DD/MM/YYYY, HH:MM*, you should choose second button.""")
-        st.write("""* If the format is *[DD.MM.YYYY, HH:MM:SS]*, you should choose third button.""")
+        st.write("""* If the format is *DD.MM.YYYY HH:MM*, you should choose *DD.MM.YYYY HH:MM* from the date format box.""")
+        st.write("""* If the format is *DD/MM/YYYY, HH:MM*, you should choose *DD/MM/YYYY, HH:MM* from the date format box.""")
+        st.write("""* If the format is *[DD.MM.YYYY, HH:MM:SS]*, you should choose *[DD.MM.YYYY HH:MM:SS]* from the date format box.""")
+        st.write("""* If you are not sure, keep *Auto-detect*, the first option of the box. The format (including 12-hour AM/PM, 2-digit years and iOS exports) is detected from the first lines of the file.""")
         st.write("""* If the format doesn't match them, sorry this app won't work for you. :worried: You can edit the format. """)
-        st.write("""3. You should upload the text file and select the timeformat""")
+        st.write("""3. You should upload the text file (or the zip file of the export, media files in it are skipped) and select the timeformat""")
         st.write("""\n""")
         st.markdown("<h4 style='text-align:center;'>Here We Go!</h4>", unsafe_allow_html=True)
 
-
-
-    elif page == "Model Application / Örnek Uygulama":
-
-        df = functions.txtToDf("group_chat_data.txt", "Format1")
-        n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words = functions.df_general_stats(df)
-
-        st.markdown("<h1 style='text-align:center;'>WhatsApp Group Chat Analysis</h1>",unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:center;'>Sample Model Application</h2>", unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:left;'>All Group Statistic</h2>", unsafe_allow_html=True)
-        st.markdown("<h3 style='text-align:left;'>General Statistics of the Group</h3>", unsafe_allow_html=True)
-
-        col1, col2, col3, col4 = st.columns([5, 5, 5, 5])
-        col1.metric("Number of Days:", n_days)
-        col2.metric('Number of Users:', n_users)
-        col3.metric("Number of Messages:", n_messages)
-        col4.metric("Number of Words:", n_words)
-
-        col5, col6, col7, col8 = st.columns([5, 5, 5, 5])
-        col5.metric('Avg. Messages per User:', "{:.2f}".format(avg_message_per_user))
-        col6.metric("Avg. Messages per Day:", "{:.2f}".format(avg_message_per_day))
-        col7.metric('Avg. Len. of Msgs. (word):', "{:.2f}".format(avg_words))
-        col8.metric("Avg Len. Of Msgs. (char):", "{:.2f}".format(avg_len_message))
-
-        col9, col10, col11, col12 = st.columns([5, 5, 5, 5])
-        col9.metric("Min. Len. Of Msgs (word): ", min_word_message)
-        col10.metric("Max. Len. of Msgs (word):", max_word_message)
-        col11.metric("Min. Len. of Msgs (char):", min_len_message)
-        col12.metric("Max. Len. of Msgs (char):", max_len_message)
-
-        col13, col14, col15, col16 = st.columns([10, 1, 1, 1])
-        col13.metric('User Who Wrote the Longest:', user_max_len_message)
-
-        st.write("""*The Longest Message*""")
-        st.write(df[df["len_message"] == max_len_message]["message"].item())
-
-        st.markdown("<h3 style='text-align:left;'>Conversation History Plot</h3>", unsafe_allow_html=True)
-        # Create a line plot about number of messages based days
-        x = df['date'].value_counts().sort_index()
-        st.line_chart(x, use_container_width=True)
-
-        col1, col2, col3 = st.columns([9.5, 1, 9.5])
-        with col1:
-            st.markdown("<h4 style='text-align:left;'>Top N Days</h4>", unsafe_allow_html=True)
-            n = st.number_input('Enter the number of days you want to see', min_value=1, max_value=50, value=5, step=1)
-            st.dataframe(functions.top_n_days(df, n), width = None)
-
-        with col3:
-            st.markdown("<h4 style='text-align:left;'>Top N Users</h4>", unsafe_allow_html=True)
-            n = st.number_input('Enter the number of users you want to see', min_value=1, max_value=50, value=5, step=1)
-            st.dataframe(functions.top_n_user(df, n), width = None)
-
-        st.markdown("<h3 style='text-align:left;'>Most Active Hours</h3>", unsafe_allow_html=True)
-        grouped_by_time = df.groupby('hour').sum().sort_values(by='hour')
-        grouped_by_time = grouped_by_time["message_count"]
-        st.bar_chart(grouped_by_time, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Most Active Days</h3>", unsafe_allow_html=True)
-        grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-        grouped_by_dayt = grouped_by_dayt["message_count"]
-        st.bar_chart(grouped_by_dayt, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Heatmap of Day-Hour</h3>", unsafe_allow_html=True)
-        fig = px.imshow(pd.crosstab(df['day_t'], df['hour']))
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Word-Cloud of Group</h3>", unsafe_allow_html=True)
-        st.write("""Note: Turkish stopwords were removed in this process.""")
-        # Display the generated image:
-        st.set_option('deprecation.showPyplotGlobalUse', False)
-        wordcloud = functions.word_cloud_all(df)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis("off")
-        plt.show()
-        st.pyplot()
-
-        ##########SELECTED USER STATISTICS##########
-
-        st.markdown("<h2 style='text-align:left;'>Selected User Statistic</h2>", unsafe_allow_html=True)
-        user_list = sorted(df["user"].unique().tolist())
-        selected_user = st.selectbox('Select Username', user_list)
-
-        st.markdown("<h3 style='text-align:left;'>General Statistics of the Selected User</h3>", unsafe_allow_html=True)
-
-        col1, col2, col3, col4, col5 = st.columns([5, 5, 5, 5, 5])
-        col1.metric("Number of Days:", n_days)
-        col2.metric('Number of Messages:', df[df["user"] == selected_user].shape[0])
-        col3.metric("Avg. Msgs. per Day:", "{:.2f}".format(df[df["user"] == selected_user].shape[0] / n_days))
-        col4.metric("Number of Words:", df[df["user"] == selected_user]["n_words"].sum())
-        col5.metric("Avg. Words per Msgs.:", "{:.2f}".format(df[df["user"] == selected_user]["n_words"].sum() / df[df["user"] == selected_user].shape[0]))
-
-        col6, col7, col8 = st.columns([5, 5, 5])
-        col6.metric("Min. Len. of Msgs (char):", df[df["user"] == selected_user]["len_message"].min())
-        col7.metric("Max. Len. of Msgs (char):", df[df["user"] == selected_user]["len_message"].max())
-        col8.metric("Avg. Len. of Msgs (char):", "{:.2f}".format(df[df["user"] == selected_user]["len_message"].mean()))
-
-        col9, col10, col11 = st.columns([5, 5, 5])
-        col9.metric("Min. Len. of Msgs (word):", df[df["user"] == selected_user]["n_words"].min())
-        col10.metric("Max. Len. of Msgs (word):", df[df["user"] == selected_user]["n_words"].max())
-        col11.metric("Avg. Len. of Msgs (word):", "{:.2f}".format(df[df["user"] == selected_user]["n_words"].mean()))
-
-        st.write("""*The Longest Message*""")
-        st.write(df[(df["user"] == selected_user) & (df["len_message"] == df[df["user"] == selected_user]["len_message"].max())]["message"].item())
-
-        st.markdown("<h3 style='text-align:left;'>Conversation History Plot</h3>", unsafe_allow_html=True)
-        # Create a line plot about number of messages based days
-        x = df[df["user"] == selected_user]['date'].value_counts().sort_index()
-        st.line_chart(x, use_container_width=True)
-
-        col1, col2, col3 = st.columns([9.5, 1, 9.5])
-        with col1:
-            st.markdown("<h3 style='text-align:left;'>Top N Days</h3>", unsafe_allow_html=True)
-            n1 = st.number_input('Enter the number of days you want to see for user', min_value=1, max_value=50, value=5, step=1)
-            user_df1 = df[df["user"] == selected_user]
-            user_df1 = functions.top_n_days(user_df1, n1)
-            st.dataframe(user_df1, width=None)
-
-        with col3:
-            st.markdown("<h3 style='text-align:left;'>Top N Days Graph</h3>", unsafe_allow_html=True)
-            st.bar_chart(user_df1["message_count"], use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Most Active Hours</h3>", unsafe_allow_html=True)
-        grouped_by_time = df[df["user"] == selected_user]
-        grouped_by_time = grouped_by_time.groupby('hour').sum().sort_values(by='hour')
-        grouped_by_time = grouped_by_time["message_count"]
-        st.bar_chart(grouped_by_time, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Most Active Days</h3>", unsafe_allow_html=True)
-        grouped_by_dayt = df[df["user"] == selected_user]
-        grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-        grouped_by_dayt = grouped_by_dayt["message_count"]
-        st.bar_chart(grouped_by_dayt, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Heatmap of Day-Hour</h3>", unsafe_allow_html=True)
-        heatmap_df = df[df["user"] == selected_user]
-        fig = px.imshow(pd.crosstab(heatmap_df['day_t'], heatmap_df['hour']))
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>Word-Cloud of the User</h3>", unsafe_allow_html=True)
-        st.write("""Note: Turkish stopwords were removed in this process.""")
-        # Display the generated image:
-        st.set_option('deprecation.showPyplotGlobalUse', False)
-        wordcloud_df = df[df["user"] == selected_user]
-        wordcloud = functions.word_cloud_all(wordcloud_df)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis("off")
-        plt.show()
-        st.pyplot()
-
-    elif page == "Do Your Own Analysis / Kendi Analizinizi Yapın":
-
-        st.markdown("<h1 style='text-align:center;'>WhatsApp Group Chat Analysis</h1>", unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:center;'>Do Your Own Analysis</h2>", unsafe_allow_html=True)
-
-        uploaded_file = st.sidebar.file_uploader("Upload a group chat txt file:", accept_multiple_files=False)
-        selected_format = st.sidebar.selectbox('What is the date format?', ('DD.MM.YYYY HH:MM', 'DD/MM/YYYY, HH:MM', '[DD.MM.YYYY HH:MM:SS]'))
-
-        if selected_format == 'DD.MM.YYYY HH:MM':
-            time_format = "Format1"
-        elif selected_format == 'DD/MM/YYYY, HH:MM':
-            time_format = "Format2"
-        elif selected_format == "[DD.MM.YYYY HH:MM:SS]":
-            time_format = "Format3"
-
-        if uploaded_file is not None:
-            # To read file as bytes:
-            bytes_data = uploaded_file.getvalue()
-            data = bytes_data.decode(encoding='utf-8')
-
-            df = functions.txtToDf_inputpage(data, time_format)
-            n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words = functions.df_general_stats(df)
-
-            st.markdown("<h2 style='text-align:left;'>All Group Statistic</h2>", unsafe_allow_html=True)
-            st.markdown("<h3 style='text-align:left;'>General Statistics of the Group</h3>", unsafe_allow_html=True)
-
-            col1, col2, col3, col4 = st.columns([5, 5, 5, 5])
-            col1.metric("Number of Days:", n_days)
-            col2.metric('Number of Users:', n_users)
-            col3.metric("Number of Messages:", n_messages)
-            col4.metric("Number of Words:", n_words)
-
-            col5, col6, col7, col8 = st.columns([5, 5, 5, 5])
-            col5.metric('Avg. Messages per User:', "{:.2f}".format(avg_message_per_user))
-            col6.metric("Avg. Messages per Day:", "{:.2f}".format(avg_message_per_day))
-            col7.metric('Avg. Len. of Msgs. (word):', "{:.2f}".format(avg_words))
-            col8.metric("Avg Len. Of Msgs. (char):", "{:.2f}".format(avg_len_message))
-
-            col9, col10, col11, col12 = st.columns([5, 5, 5, 5])
-            col9.metric("Min. Len. Of Msgs (word): ", min_word_message)
-            col10.metric("Max. Len. of Msgs (word):", max_word_message)
-            col11.metric("Min. Len. of Msgs (char):", min_len_message)
-            col12.metric("Max. Len. of Msgs (char):", max_len_message)
-
-            col13, col14, col15, col16 = st.columns([10, 1, 1, 1])
-            col13.metric('User Who Wrote the Longest:', user_max_len_message)
-
-            st.write("""*The Longest Message*""")
-            st.write(df[df["len_message"] == max_len_message]["message"].item())
-
-            st.markdown("<h3 style='text-align:left;'>Conversation History Plot</h3>", unsafe_allow_html=True)
-            # Create a line plot about number of messages based days
-            x = df['date'].value_counts().sort_index()
-            st.line_chart(x, use_container_width=True)
-
-            col1, col2, col3 = st.columns([9.5, 1, 9.5])
-            with col1:
-                st.markdown("<h4 style='text-align:left;'>Top N Days</h4>", unsafe_allow_html=True)
-                n = st.number_input('Enter the number of days you want to see', min_value=1, max_value=50, value=5, step=1)
-                st.dataframe(functions.top_n_days(df, n), width = None)
-
-            with col3:
-                st.markdown("<h4 style='text-align:left;'>Top N Users</h4>", unsafe_allow_html=True)
-                n = st.number_input('Enter the number of users you want to see', min_value=1, max_value=50, value=5, step=1)
-                st.dataframe(functions.top_n_user(df, n), width = None)
-
-            st.markdown("<h3 style='text-align:left;'>Most Active Hours</h3>", unsafe_allow_html=True)
-            grouped_by_time = df.groupby('hour').sum().sort_values(by='hour')
-            grouped_by_time = grouped_by_time["message_count"]
-            st.bar_chart(grouped_by_time, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Most Active Days</h3>", unsafe_allow_html=True)
-            grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-            grouped_by_dayt = grouped_by_dayt["message_count"]
-            st.bar_chart(grouped_by_dayt, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Heatmap of Day-Hour</h3>", unsafe_allow_html=True)
-            fig = px.imshow(pd.crosstab(df['day_t'], df['hour']))
-            st.plotly_chart(fig, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Word-Cloud of Group</h3>", unsafe_allow_html=True)
-            st.write("""Note: Turkish stopwords were removed in this process.""")
-            # Display the generated image:
-            st.set_option('deprecation.showPyplotGlobalUse', False)
-            wordcloud = functions.word_cloud_all(df)
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.show()
-            st.pyplot()
-
-            ##########SELECTED USER STATISTICS##########
-
-            st.markdown("<h2 style='text-align:left;'>Selected User Statistic</h2>", unsafe_allow_html=True)
-            user_list = sorted(df["user"].unique().tolist())
-            selected_user = st.selectbox('Select Username', user_list)
-
-            st.markdown("<h3 style='text-align:left;'>General Statistics of the Selected User</h3>", unsafe_allow_html=True)
-
-            col1, col2, col3, col4, col5 = st.columns([5, 5, 5, 5, 5])
-            col1.metric("Number of Days:", n_days)
-            col2.metric('Number of Messages:', df[df["user"] == selected_user].shape[0])
-            col3.metric("Avg. Msgs. per Day:", "{:.2f}".format(df[df["user"] == selected_user].shape[0] / n_days))
-            col4.metric("Number of Words:", df[df["user"] == selected_user]["n_words"].sum())
-            col5.metric("Avg. Words per Msgs.:", "{:.2f}".format(df[df["user"] == selected_user]["n_words"].sum() / df[df["user"] == selected_user].shape[0]))
-
-            col6, col7, col8 = st.columns([5, 5, 5])
-            col6.metric("Min. Len. of Msgs (char):", df[df["user"] == selected_user]["len_message"].min())
-            col7.metric("Max. Len. of Msgs (char):", df[df["user"] == selected_user]["len_message"].max())
-            col8.metric("Avg. Len. of Msgs (char):", "{:.2f}".format(df[df["user"] == selected_user]["len_message"].mean()))
-
-            col9, col10, col11 = st.columns([5, 5, 5])
-            col9.metric("Min. Len. of Msgs (word):", df[df["user"] == selected_user]["n_words"].min())
-            col10.metric("Max. Len. of Msgs (word):", df[df["user"] == selected_user]["n_words"].max())
-            col11.metric("Avg. Len. of Msgs (word):", "{:.2f}".format(df[df["user"] == selected_user]["n_words"].mean()))
-
-            st.write("""*The Longest Message*""")
-            st.write(df[(df["user"] == selected_user) & (df["len_message"] == df[df["user"] == selected_user]["len_message"].max())]["message"].item())
-
-            st.markdown("<h3 style='text-align:left;'>Conversation History Plot</h3>", unsafe_allow_html=True)
-            # Create a line plot about number of messages based days
-            x = df[df["user"] == selected_user]['date'].value_counts().sort_index()
-            st.line_chart(x, use_container_width=True)
-
-            col1, col2, col3 = st.columns([9.5, 1, 9.5])
-            with col1:
-                st.markdown("<h3 style='text-align:left;'>Top N Days</h3>", unsafe_allow_html=True)
-                n1 = st.number_input('Enter the number of days you want to see for user', min_value=1, max_value=50, value=5, step=1)
-                user_df1 = df[df["user"] == selected_user]
-                user_df1 = functions.top_n_days(user_df1, n1)
-                st.dataframe(user_df1, width=None)
-
-            with col3:
-                st.markdown("<h3 style='text-align:left;'>Top N Days Graph</h3>", unsafe_allow_html=True)
-                st.bar_chart(user_df1["message_count"], use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Most Active Hours</h3>", unsafe_allow_html=True)
-            grouped_by_time = df[df["user"] == selected_user]
-            grouped_by_time = grouped_by_time.groupby('hour').sum().sort_values(by='hour')
-            grouped_by_time = grouped_by_time["message_count"]
-            st.bar_chart(grouped_by_time, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Most Active Days</h3>", unsafe_allow_html=True)
-            grouped_by_dayt = df[df["user"] == selected_user]
-            grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-            grouped_by_dayt = grouped_by_dayt["message_count"]
-            st.bar_chart(grouped_by_dayt, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Heatmap of Day-Hour</h3>", unsafe_allow_html=True)
-            heatmap_df = df[df["user"] == selected_user]
-            fig = px.imshow(pd.crosstab(heatmap_df['day_t'], heatmap_df['hour']))
-            st.plotly_chart(fig, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>Word-Cloud of Group</h3>", unsafe_allow_html=True)
-            st.write("""Note: Turkish stopwords were removed in this process.""")
-            # Display the generated image:
-            st.set_option('deprecation.showPyplotGlobalUse', False)
-            wordcloud_df = df[df["user"] == selected_user]
-            wordcloud = functions.word_cloud_all(wordcloud_df)
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.show()
-            st.pyplot()
-
-elif selected_language == "Türkçe":
-
-    if page == "How to Use / Nasıl Kullanılır":
+    elif selected_language == "Türkçe":
         st.markdown("<h1 style='text-align:center;'>WhatsApp Sohbet Analiz</h1>", unsafe_allow_html=True)
         st.markdown("<h2 style='text-align:center;'>Nasıl Kullanılır</h2>", unsafe_allow_html=True)
         st.write(
@@ -366,353 +613,71 @@ elif selected_language == "Türkçe":
         st.write("""Uygulamayı kullanmak için;""")
         st.write("""1. WhatsApp Sohbetini dışa aktarmanız gerekir (medya seçeneği olmadan tercih edilir)""")
         st.write("""2. Dışa aktarılan metin dosyasındaki tarih biçimini kontrol etmelisiniz""")
-        st.write("""* Eğer format *GG.AA.YYYY SS:DD* şeklinde ise ilk butonu seçmelisiniz.""")
-        st.write("""* Eğer format *GG/AA/YYYY, SS:DD* şeklinde ise ikinci butonu seçmelisiniz.""")
-        st.write("""* Eğer format *[GG.AA.YYYY, SS:DD:SS]* şeklinde ise üçüncü butonu seçmelisiniz.""")
+        st.write("""* Eğer format *GG.AA.YYYY SS:DD* şeklinde ise tarih formatı kutusundan *GG.AA.YYYY SS:DD* seçeneğini seçmelisiniz.""")
+        st.write("""* Eğer format *GG/AA/YYYY, SS:DD* şeklinde ise tarih formatı kutusundan *GG/AA/YYYY, SS:DD* seçeneğini seçmelisiniz.""")
+        st.write("""* Eğer format *[GG.AA.YYYY, SS:DD:SS]* şeklinde ise tarih formatı kutusundan *[GG.AA.YYYY SS:DD:SN]* seçeneğini seçmelisiniz.""")
+        st.write("""* Emin değilseniz kutunun ilk seçeneği olan *Otomatik Algıla* seçeneğini bırakın. Format (12 saatlik ÖÖ/ÖS, 2 haneli yıllar ve iOS dahil) dosyanın ilk satırlarından algılanır.""")
         st.write(
             """*  Biçim onlarla eşleşmiyorsa, üzgünüm bu uygulama sizin için çalışmayacak. :worried: Metin dosyanızı düzenleyebilirsiniz. """)
-        st.write("""Metin dosyasını yüklemeli ve zaman biçimini seçmelisiniz""")
+        st.write("""Metin dosyasını (veya dışa aktarılan zip dosyasını, içindeki medya dosyaları atlanır) yüklemeli ve zaman biçimini seçmelisiniz""")
         st.write("""\n""")
         st.markdown("<h4 style='text-align:center;'>Hadi Başlayalım!</h4>", unsafe_allow_html=True)
 
+elif page == "Model Application / Örnek Uygulama":
 
+    chat = chat_cache.load_chat("group_chat_data.txt", "Format1")
 
-    elif page == "Model Application / Örnek Uygulama":
-
-        df = functions.txtToDf("group_chat_data.txt", "Format1")
-        n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words = functions.df_general_stats(
-            df)
-
-        st.markdown("<h1 style='text-align:center;'>WhatsApp Sohbet Analizi</h1>", unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:center;'>Örnek Proje Uygulaması</h2>", unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:left;'>Toplu Grup Analizi</h2>", unsafe_allow_html=True)
-        st.markdown("<h3 style='text-align:left;'>Grubun Genel İstatistikleri</h3>", unsafe_allow_html=True)
-
-        col1, col2, col3, col4 = st.columns([5, 5, 5, 5])
-        col1.metric("Gün Sayısı:", n_days)
-        col2.metric('Kullanıcı Sayısı:', n_users)
-        col3.metric("Mesaj Sayısı:", n_messages)
-        col4.metric("Kelime Sayısı:", n_words)
-
-        col5, col6, col7, col8 = st.columns([5, 5, 5, 5])
-        col5.metric('Kullanıcı Başına Ort. Mesaj:', "{:.2f}".format(avg_message_per_user))
-        col6.metric("Gün Başına Ort. Mesaj:", "{:.2f}".format(avg_message_per_day))
-        col7.metric('Ort. Mesaj Uzun. (kelime):', "{:.2f}".format(avg_words))
-        col8.metric("Ort. Mesaj Uzun. (karakter):", "{:.2f}".format(avg_len_message))
-
-        col9, col10, col11, col12 = st.columns([5, 5, 5, 5])
-        col9.metric("En Kısa Msj. Uzun. (kelime): ", min_word_message)
-        col10.metric("En Uzun Msj. Uzun. (kelime):", max_word_message)
-        col11.metric("En Kısa Msj. Uzun. (karakter):", min_len_message)
-        col12.metric("En Uzun Msj. Uzun. (karakter):", max_len_message)
-
-        col13, col14, col15, col16 = st.columns([10, 1, 1, 1])
-        col13.metric('En Uzun Mesajı Yazan:', user_max_len_message)
-
-        st.write("""*En Uzun Mesaj*""")
-        st.write(df[df["len_message"] == max_len_message]["message"].item())
-
-        st.markdown("<h3 style='text-align:left;'>Konuşma Geçmişi Grafiği</h3>", unsafe_allow_html=True)
-        # Create a line plot about number of messages based days
-        x = df['date'].value_counts().sort_index()
-        st.line_chart(x, use_container_width=True)
-
-        col1, col2, col3 = st.columns([9.5, 1, 9.5])
-        with col1:
-            st.markdown("<h4 style='text-align:left;'>En Aktif Günler</h4>", unsafe_allow_html=True)
-            n = st.number_input('Kaç gün görmek istediğinizi seçiniz', min_value=1, max_value=50, value=5, step=1)
-            st.write("""date: gün & message_count: mesaj sayısı""")
-            st.dataframe(functions.top_n_days(df, n), width=None)
-
-        with col3:
-            st.markdown("<h4 style='text-align:left;'>En Aktif Kullanıcılar</h4>", unsafe_allow_html=True)
-            n = st.number_input('Kaç kullanıcı görmek istediğinizi seçiniz', min_value=1, max_value=50, value=5, step=1)
-            st.write("""user: kullanıcı & message_count: mesaj sayısı""")
-            st.dataframe(functions.top_n_user(df, n), width=None)
-
-        st.markdown("<h3 style='text-align:left;'>En Aktif Saatler</h3>", unsafe_allow_html=True)
-        grouped_by_time = df.groupby('hour').sum().sort_values(by='hour')
-        grouped_by_time = grouped_by_time["message_count"]
-        st.bar_chart(grouped_by_time, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-        grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-        grouped_by_dayt = grouped_by_dayt["message_count"]
-        st.bar_chart(grouped_by_dayt, use_container_width=True)
-        st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-        st.markdown("<h3 style='text-align:left;'>Gün-Saat Isı Haritası</h3>", unsafe_allow_html=True)
-        fig = px.imshow(pd.crosstab(df['day_t'], df['hour']))
-        st.plotly_chart(fig, use_container_width=True)
-        st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-        st.markdown("<h3 style='text-align:left;'>Grubun Kelime Bulutu</h3>", unsafe_allow_html=True)
-        st.write("""Not: Türkçe stopwords (Bu, şu vb.) kelimeler çıkartılmıştır.""")
-        # Display the generated image:
-        st.set_option('deprecation.showPyplotGlobalUse', False)
-        wordcloud = functions.word_cloud_all(df)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis("off")
-        plt.show()
-        st.pyplot()
+    st.markdown("<h1 style='text-align:center;'>{}</h1>".format(texts["title"]), unsafe_allow_html=True)
+    st.markdown("<h2 style='text-align:center;'>{}</h2>".format(texts["model_title"]), unsafe_allow_html=True)
+    analysis_page(chat, texts)
 
-        ##########SELECTED USER STATISTICS##########
+elif page == "Do Your Own Analysis / Kendi Analizinizi Yapın":
+
+    st.markdown("<h1 style='text-align:center;'>{}</h1>".format(texts["title"]), unsafe_allow_html=True)
+    st.markdown("<h2 style='text-align:center;'>{}</h2>".format(texts["upload_title"]), unsafe_allow_html=True)
+
+    uploaded_file = st.sidebar.file_uploader(texts["upload"], type=["txt", "zip"], accept_multiple_files=False)
+    formats = format_options(texts)
+    selected_format = st.sidebar.selectbox(texts["select_format"], list(formats))
+    time_format = formats[selected_format]
+
+    if uploaded_file is not None:
+        # the uploaded file object is decoded while it is parsed (a zip export is read without its media files)
+        try:
+            chat = chat_cache.load_chat(uploaded_file, time_format)
+        except ValueError:
+            st.error(texts["format_error"])
+            st.stop()
+        analysis_page(chat, texts)
+
+elif page == "Compare Chats / Sohbetleri Karşılaştır":
+
+    st.markdown("<h1 style='text-align:center;'>{}</h1>".format(texts["title"]), unsafe_allow_html=True)
+    st.markdown("<h2 style='text-align:center;'>{}</h2>".format(texts["compare_title"]), unsafe_allow_html=True)
+
+    uploaded_files = st.sidebar.file_uploader(texts["compare_upload"], type=["txt", "zip"], accept_multiple_files=True)
+
+    if uploaded_files:
+        # the chats are parsed at the same time on worker processes, the ones parsed before come from the cache
+        with st.spinner(texts["parsing"].format(len(uploaded_files))):
+            loaded = chat_cache.load_chats(uploaded_files)
+
+        chats = {}
+        for uploaded_file, chat in zip(uploaded_files, loaded):
+            if isinstance(chat, Exception):
+                st.error(texts["read_error"].format(uploaded_file.name, chat))
+                continue
+            name, n = uploaded_file.name, 1
+            while name in chats:  # same file name uploaded twice
+                n += 1
+                name = "{} ({})".format(uploaded_file.name, n)
+            chats[name] = chat
+
+        if chats:
+            section(texts["compare_stats"], "compare_stats", show_compare_stats, chats, texts, opened=True)
+            section(texts["daily_activity"], "compare_daily_activity", show_daily_activity, chats, texts, opened=True)
+            section(texts["compare_top_users"], "compare_top_users", show_compare_top_users, chats, texts, opened=True)
 
-        st.markdown("<h2 style='text-align:left;'>Seçilen Kullanıcı İstatistikler</h2>", unsafe_allow_html=True)
-        user_list = sorted(df["user"].unique().tolist())
-        selected_user = st.selectbox('Kullanıcı Seçiniz', user_list)
-
-        st.markdown("<h3 style='text-align:left;'>Kullanıcının Genel İstatistikleri</h3>", unsafe_allow_html=True)
-
-        col1, col2, col3, col4, col5 = st.columns([5, 5, 5, 5, 5])
-        col1.metric("Gün Sayısı:", n_days)
-        col2.metric('Mesaj Sayısı:', df[df["user"] == selected_user].shape[0])
-        col3.metric("Gün Başına Ort. Mesaj:", "{:.2f}".format(df[df["user"] == selected_user].shape[0] / n_days))
-        col4.metric("Kelime Sayısı:", df[df["user"] == selected_user]["n_words"].sum())
-        col5.metric("Msj. Başına Ort. Kelime:", "{:.2f}".format(
-            df[df["user"] == selected_user]["n_words"].sum() / df[df["user"] == selected_user].shape[0]))
-
-        col6, col7, col8 = st.columns([5, 5, 5])
-        col6.metric("En Kısa Msj. Uzun. (karakter):", df[df["user"] == selected_user]["len_message"].min())
-        col7.metric("En Uzun Msj. Uzun. (karakter):", df[df["user"] == selected_user]["len_message"].max())
-        col8.metric("Ort. Mesaj Uzunluğu (karakter)", "{:.2f}".format(df[df["user"] == selected_user]["len_message"].mean()))
-
-        col9, col10, col11 = st.columns([5, 5, 5])
-        col9.metric("En Kısa Msj. Uzun. (kelime):", df[df["user"] == selected_user]["n_words"].min())
-        col10.metric("En Uzun Msj. Uzun. (kelime):", df[df["user"] == selected_user]["n_words"].max())
-        col11.metric("Ort. Mesaj Uzunluğu (kelime):", "{:.2f}".format(df[df["user"] == selected_user]["n_words"].mean()))
-
-        st.write("""*En Uzun Mesaj*""")
-        st.write(df[(df["user"] == selected_user) & (
-                    df["len_message"] == df[df["user"] == selected_user]["len_message"].max())]["message"].item())
-
-        st.markdown("<h3 style='text-align:left;'>Konuşma Geçmişi Grafiği</h3>", unsafe_allow_html=True)
-        # Create a line plot about number of messages based days
-        x = df[df["user"] == selected_user]['date'].value_counts().sort_index()
-        st.line_chart(x, use_container_width=True)
-
-        col1, col2, col3 = st.columns([9.5, 1, 9.5])
-        with col1:
-            st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-            n1 = st.number_input('Kullanıcı için görmek istediğiniz gün sayısını giriniz', min_value=1, max_value=50,
-                                 value=5, step=1)
-            st.write("""date: gün & message_count: mesaj sayısı""")
-            user_df1 = df[df["user"] == selected_user]
-            user_df1 = functions.top_n_days(user_df1, n1)
-            st.dataframe(user_df1, width=None)
-
-        with col3:
-            st.markdown("<h3 style='text-align:left;'>En Aktif Günler Grafiği</h3>", unsafe_allow_html=True)
-            st.bar_chart(user_df1["message_count"], use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>En Aktif Saatler</h3>", unsafe_allow_html=True)
-        grouped_by_time = df[df["user"] == selected_user]
-        grouped_by_time = grouped_by_time.groupby('hour').sum().sort_values(by='hour')
-        grouped_by_time = grouped_by_time["message_count"]
-        st.bar_chart(grouped_by_time, use_container_width=True)
-
-        st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-        grouped_by_dayt = df[df["user"] == selected_user]
-        grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-        grouped_by_dayt = grouped_by_dayt["message_count"]
-        st.bar_chart(grouped_by_dayt, use_container_width=True)
-        st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-        st.markdown("<h3 style='text-align:left;'>Gün-Saat Isı Haritası</h3>", unsafe_allow_html=True)
-        heatmap_df = df[df["user"] == selected_user]
-        fig = px.imshow(pd.crosstab(heatmap_df['day_t'], heatmap_df['hour']))
-        st.plotly_chart(fig, use_container_width=True)
-        st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-        st.markdown("<h3 style='text-align:left;'>Kullanıcının Kelime Bulutu</h3>", unsafe_allow_html=True)
-        st.write("""Not: Türkçe stopwords (Bu, şu vb.) kelimeler çıkartılmıştır.""")
-        # Display the generated image:
-        st.set_option('deprecation.showPyplotGlobalUse', False)
-        wordcloud_df = df[df["user"] == selected_user]
-        wordcloud = functions.word_cloud_all(wordcloud_df)
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis("off")
-        plt.show()
-        st.pyplot()
-
-    elif page == "Do Your Own Analysis / Kendi Analizinizi Yapın":
-
-        st.markdown("<h1 style='text-align:center;'>WhatsApp Sohbet Analizi</h1>", unsafe_allow_html=True)
-        st.markdown("<h2 style='text-align:center;'>Kendi Analizinizi Yapın</h2>", unsafe_allow_html=True)
-
-        uploaded_file = st.sidebar.file_uploader("Sohbet metin dosyası yükleyin:", accept_multiple_files=False)
-        selected_format = st.sidebar.selectbox('Tarih formatını seçiniz:',
-                                               ('GG.AA.YYYY SS:DD', 'GG/AA/YYYY, SS:DD', '[GG.AA.YYYY SS:DD:SS]'))
-
-        if selected_format == 'GG.AA.YYYY SS:DD':
-            time_format = "Format1"
-        elif selected_format == 'GG/AA/YYYY, SS:DD':
-            time_format = "Format2"
-        elif selected_format == "[GG.AA.YYYY SS:DD:SS]":
-            time_format = "Format3"
-
-        if uploaded_file is not None:
-            # To read file as bytes:
-            bytes_data = uploaded_file.getvalue()
-            data = bytes_data.decode(encoding='utf-8')
-
-            df = functions.txtToDf_inputpage(data, time_format)
-            n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words = functions.df_general_stats(
-                df)
-
-            st.markdown("<h2 style='text-align:left;'>Toplu Grup Analizi</h2>", unsafe_allow_html=True)
-            st.markdown("<h3 style='text-align:left;'>Grubun Genel İstatistikleri</h3>", unsafe_allow_html=True)
-
-            col1, col2, col3, col4 = st.columns([5, 5, 5, 5])
-            col1.metric("Gün Sayısı:", n_days)
-            col2.metric('Kullanıcı Sayısı:', n_users)
-            col3.metric("Mesaj Sayısı:", n_messages)
-            col4.metric("Kelime Sayısı:", n_words)
-
-            col5, col6, col7, col8 = st.columns([5, 5, 5, 5])
-            col5.metric('Kullanıcı Başına Ort. Mesaj', "{:.2f}".format(avg_message_per_user))
-            col6.metric("Gün Başına Ort. Mesaj:", "{:.2f}".format(avg_message_per_day))
-            col7.metric('Ort. Mesaj Uzun. (kelime):', "{:.2f}".format(avg_words))
-            col8.metric("Ort. Mesaj Uzun. (karakter):", "{:.2f}".format(avg_len_message))
-
-            col9, col10, col11, col12 = st.columns([5, 5, 5, 5])
-            col9.metric("En Kısa Msj. Uzun. (kelime): ", min_word_message)
-            col10.metric("En Uzun Msj. Uzun. (kelime):", max_word_message)
-            col11.metric("En Kısa Msj. Uzun. (karakter):", min_len_message)
-            col12.metric("En Uzun Msj. Uzun. (karakter):", max_len_message)
-
-            col13, col14, col15, col16 = st.columns([10, 1, 1, 1])
-            col13.metric('En Uzun Mesajı Yazan:', user_max_len_message)
-
-            st.write("""*En Uzun Mesaj*""")
-            st.write(df[df["len_message"] == max_len_message]["message"].item())
-
-            st.markdown("<h3 style='text-align:left;'>Konuşma Geçmişi Grafiği</h3>", unsafe_allow_html=True)
-            # Create a line plot about number of messages based days
-            x = df['date'].value_counts().sort_index()
-            st.line_chart(x, use_container_width=True)
-
-            col1, col2, col3 = st.columns([9.5, 1, 9.5])
-            with col1:
-                st.markdown("<h4 style='text-align:left;'>En Aktif Günler</h4>", unsafe_allow_html=True)
-                n = st.number_input('Kaç gün görmek istediğinizi seçiniz', min_value=1, max_value=50, value=5,
-                                    step=1)
-                st.write("""date: gün & message_count: mesaj sayısı""")
-                st.dataframe(functions.top_n_days(df, n), width=None)
-
-            with col3:
-                st.markdown("<h4 style='text-align:left;'>En Aktif Kullanıcılar</h4>", unsafe_allow_html=True)
-                n = st.number_input('Kaç kullanıcı görmek istediğinizi seçiniz', min_value=1, max_value=50, value=5,
-                                    step=1)
-                st.write("""user: kullanıcı & message_count: mesaj sayısı""")
-                st.dataframe(functions.top_n_user(df, n), width=None)
-
-            st.markdown("<h3 style='text-align:left;'>En Aktif Saatler</h3>", unsafe_allow_html=True)
-            grouped_by_time = df.groupby('hour').sum().sort_values(by='hour')
-            grouped_by_time = grouped_by_time["message_count"]
-            st.bar_chart(grouped_by_time, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-            grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-            grouped_by_dayt = grouped_by_dayt["message_count"]
-            st.bar_chart(grouped_by_dayt, use_container_width=True)
-            st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-            st.markdown("<h3 style='text-align:left;'>Gün-Saat Isı Haritası</h3>", unsafe_allow_html=True)
-            fig = px.imshow(pd.crosstab(df['day_t'], df['hour']))
-            st.plotly_chart(fig, use_container_width=True)
-            st.write("""Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-
-            st.markdown("<h3 style='text-align:left;'>Grubun Kelime Bulutu</h3>", unsafe_allow_html=True)
-            st.write("""Not: Türkçe stopwords (Bu, şu vb.) kelimeler çıkartılmıştır.""")
-            # Display the generated image:
-            st.set_option('deprecation.showPyplotGlobalUse', False)
-            wordcloud = functions.word_cloud_all(df)
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.show()
-            st.pyplot()
-
-            ##########SELECTED USER STATISTICS##########
-
-            st.markdown("<h2 style='text-align:left;'>Seçilen Kullanıcı İstatistikleri</h2>", unsafe_allow_html=True)
-            user_list = sorted(df["user"].unique().tolist())
-            selected_user = st.selectbox('Kullanıcı Seçiniz', user_list)
-
-            st.markdown("<h3 style='text-align:left;'>Kullanıcının Genel İstatistikleri</h3>", unsafe_allow_html=True)
-
-            col1, col2, col3, col4, col5 = st.columns([5, 5, 5, 5, 5])
-            col1.metric("Gün Sayısı:", n_days)
-            col2.metric('Mesaj Sayısı:', df[df["user"] == selected_user].shape[0])
-            col3.metric("Gün Başına Ort. Mesaj:", "{:.2f}".format(df[df["user"] == selected_user].shape[0] / n_days))
-            col4.metric("Kelime Sayısı:", df[df["user"] == selected_user]["n_words"].sum())
-            col5.metric("Msj. Başına Ort. Kelime:", "{:.2f}".format(
-                df[df["user"] == selected_user]["n_words"].sum() / df[df["user"] == selected_user].shape[0]))
-
-            col6, col7, col8 = st.columns([5, 5, 5])
-            col6.metric("En Kısa Msj. Uzun. (karakter):", df[df["user"] == selected_user]["len_message"].min())
-            col7.metric("En Uzun Msj. Uzun. (karakter):", df[df["user"] == selected_user]["len_message"].max())
-            col8.metric("Ort. Mesaj Uzunluğu (karakter):",
-                        "{:.2f}".format(df[df["user"] == selected_user]["len_message"].mean()))
-
-            col9, col10, col11 = st.columns([5, 5, 5])
-            col9.metric("En Kısa Msj. Uzun. (kelime):", df[df["user"] == selected_user]["n_words"].min())
-            col10.metric("En Uzun Msj. Uzun. (kelime):", df[df["user"] == selected_user]["n_words"].max())
-            col11.metric("Ort. Mesaj Uzunluğu (kelime):",
-                         "{:.2f}".format(df[df["user"] == selected_user]["n_words"].mean()))
-
-            st.write("""*En Uzun Mesaj*""")
-            st.write(df[(df["user"] == selected_user) & (
-                        df["len_message"] == df[df["user"] == selected_user]["len_message"].max())]["message"].item())
-
-            st.markdown("<h3 style='text-align:left;'>Konuşma Geçmişi Grafiği</h3>", unsafe_allow_html=True)
-            # Create a line plot about number of messages based days
-            x = df[df["user"] == selected_user]['date'].value_counts().sort_index()
-            st.line_chart(x, use_container_width=True)
-
-            col1, col2, col3 = st.columns([9.5, 1, 9.5])
-            with col1:
-                st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-                n1 = st.number_input('Kullanıcı için görmek istediğiniz gün sayısını giriniz', min_value=1, max_value=50,
-                                     value=5, step=1)
-                st.write("""date: gün & message_count: mesaj sayısı""")
-                user_df1 = df[df["user"] == selected_user]
-                user_df1 = functions.top_n_days(user_df1, n1)
-                st.dataframe(user_df1, width=None)
-
-            with col3:
-                st.markdown("<h3 style='text-align:left;'>En Aktif Günler Grafiği</h3>", unsafe_allow_html=True)
-                st.bar_chart(user_df1["message_count"], use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>En Aktif Saatler</h3>", unsafe_allow_html=True)
-            grouped_by_time = df[df["user"] == selected_user]
-            grouped_by_time = grouped_by_time.groupby('hour').sum().sort_values(by='hour')
-            grouped_by_time = grouped_by_time["message_count"]
-            st.bar_chart(grouped_by_time, use_container_width=True)
-
-            st.markdown("<h3 style='text-align:left;'>En Aktif Günler</h3>", unsafe_allow_html=True)
-            grouped_by_dayt = df[df["user"] == selected_user]
-            grouped_by_dayt = df.groupby('day_t').sum().sort_values(by='day_t')
-            grouped_by_dayt = grouped_by_dayt["message_count"]
-            st.bar_chart(grouped_by_dayt, use_container_width=True)
-            st.write(
-                """Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-            st.markdown("<h3 style='text-align:left;'>Gün-Saat Isı Haritası</h3>", unsafe_allow_html=True)
-            heatmap_df = df[df["user"] == selected_user]
-            fig = px.imshow(pd.crosstab(heatmap_df['day_t'], heatmap_df['hour']))
-            st.plotly_chart(fig, use_container_width=True)
-            st.write(
-                """Mon: Pazartesi & Tue: Salı & Wed: Çarşamba & Thu: Perşembe & Fri: Cuma & Sat: Cumartesi & Sun: Pazar""")
-
-            st.markdown("<h3 style='text-align:left;'>Kullanıcının Kelime Bulutu</h3>", unsafe_allow_html=True)
-            st.write("""Not: Türkçe stopwords (Bu, şu vb.) kelimeler çıkartılmıştır.""")
-            # Display the generated image:
-            st.set_option('deprecation.showPyplotGlobalUse', False)
-            wordcloud_df = df[df["user"] == selected_user]
-            wordcloud = functions.word_cloud_all(wordcloud_df)
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.show()
-            st.pyplot()
+if debug_stages is not None:
+    with st.sidebar.expander("Debug: parse stages", expanded=True):
+        st.dataframe(instrumentation.summary(debug_stages.stop()))
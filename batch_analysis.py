@@ -0,0 +1,145 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import functions
+
+
+def find_exports(sources):
+    """
+    Export files of the given directories (every *.txt and *.zip in them, recursively), glob patterns and file paths
+
+    Example:
+      find_exports(["exports/", "archive/2022_*.txt"])
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for extension in ("*.txt", "*.zip"):
+                paths.extend(glob.glob(os.path.join(source, "**", extension), recursive=True))
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths.extend(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def output_names(paths):
+    """
+    Unique output name of every export: the file name, with a number added when two exports share it
+    """
+    names, used = {}, set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = "{}_{}".format(stem, n)
+        used.add(name)
+        names[path] = name
+    return names
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    raise TypeError("{} is not JSON serializable".format(type(value).__name__))
+
+
+def analyze_chat(path, out_dir, name, time_format="auto", top_n=10):
+    """
+    Parses one export and writes its statistics to {out_dir}/{name}.json and its dataframe to {out_dir}/{name}.parquet.
+    Runs in a worker process of the pool
+
+    Output:
+      summary: dict of the chat path, output name, number of messages and seconds spent
+
+    Example:
+      analyze_chat("exports/family.txt", "results", "family")
+    """
+    start = time.perf_counter()
+    df = functions.parse_chat(path, time_format, use_mmap=True)  # the txt exports on disk are memory-mapped
+    cube = functions.activity_cube(df)
+
+    stats = {
+        "chat": path,
+        "general": dict(zip(functions.GENERAL_STATS, functions.df_general_stats(df))),
+        "top_days": {str(date.date()): count for date, count in functions.cube_top_n_days(cube, top_n).values},
+        "top_users": dict(functions.cube_top_n_user(cube, top_n).values),
+        "hours": functions.cube_hour_counts(cube).tolist(),
+        "weekdays": functions.cube_weekday_counts(cube).to_dict(),
+        "users": functions.user_stats_table(df).drop(columns="longest_message").to_dict(orient="index"),
+    }
+
+    with open(os.path.join(out_dir, name + ".json"), "w", encoding="utf-8") as stats_file:
+        json.dump(stats, stats_file, ensure_ascii=False, indent=2, default=_json_value)
+    df.to_parquet(os.path.join(out_dir, name + ".parquet"), index=False)
+
+    return {"chat": path, "name": name, "n_messages": len(df), "seconds": time.perf_counter() - start}
+
+
+def run(paths, out_dir, workers=None, time_format="auto", top_n=10, log=sys.stderr):
+    """
+    Analyzes the exports across a pool of worker processes, printing a progress line as each one finishes
+
+    Output:
+      results: list of the summaries of the analyzed chats
+      failures: dict of path -> error message of the chats that could not be analyzed
+
+    Example:
+      results, failures = run(find_exports(["exports/"]), "results", workers=4)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = output_names(paths)
+    results, failures = [], {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(analyze_chat, path, out_dir, names[path], time_format, top_n): path for path in paths}
+        for done, job in enumerate(as_completed(jobs), 1):
+            path = jobs[job]
+            try:
+                result = job.result()
+            except Exception as error:  # one broken export shouldn't stop the whole batch
+                failures[path] = "{}: {}".format(type(error).__name__, error)
+                print("[{}/{}] FAILED {} ({})".format(done, len(jobs), path, failures[path]), file=log)
+                continue
+            results.append(result)
+            print("[{}/{}] {}: {} messages in {:.1f}s".format(
+                done, len(jobs), result["name"], result["n_messages"], result["seconds"]), file=log)
+
+    print("{} chats analyzed, {} failed in {:.1f}s".format(
+        len(results), len(failures), time.perf_counter() - start), file=log)
+    return results, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyzes exported WhatsApp chats without the interface: writes the statistics of every chat "
+                    "as JSON and its parsed dataframe as Parquet")
+    parser.add_argument("sources", nargs="+", help="export files, directories (every *.txt and *.zip in them) or glob patterns")
+    parser.add_argument("-o", "--output", default="results", help="directory of the output files (default: results)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("-f", "--time-format", default="auto", choices=["auto"] + list(functions.DATETIME_FORMATS),
+                        help="time format of the exports (default: auto-detect)")
+    parser.add_argument("-n", "--top-n", type=int, default=10, help="number of top days and users (default: 10)")
+    args = parser.parse_args(argv)
+
+    paths = find_exports(args.sources)
+    if not paths:
+        parser.error("no export file found")
+
+    results, failures = run(paths, args.output, args.workers, args.time_format, args.top_n)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
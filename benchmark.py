@@ -0,0 +1,268 @@
+import os
+import sys
+import gc
+import json
+import time
+import random
+import itertools
+import datetime
+import platform
+import argparse
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import functions
+
+# number of messages of the generated chats, from the size of the sample chat to large archives
+SIZES = {"10k": 10000, "100k": 100000, "1M": 1000000, "10M": 10000000}
+
+# functions that are measured, each called with the output of txtToDf (except txtToDf itself)
+BENCHMARKS = {
+    "txtToDf": lambda path, time_format: functions.txtToDf(path, time_format),
+    "df_general_stats": lambda df: functions.df_general_stats(df),
+    "top_n_days": lambda df: functions.top_n_days(df),
+    "top_n_user": lambda df: functions.top_n_user(df),
+    "day_hour_heatmap": lambda df: functions.day_hour_heatmap(df),
+    "word_cloud_all": lambda df: functions.word_cloud_all(df),
+}
+
+# a benchmark is a regression when it is slower (or uses more memory) than the baseline by this ratio
+THRESHOLD = 1.25
+
+# times shorter than this are mostly noise and are not compared
+MIN_SECONDS = 0.05
+
+SYLLABLES = ["ka", "le", "mi", "no", "ru", "sa", "te", "yo", "ba", "de", "gi", "ko", "lu", "ma", "ne", "pi", "ra", "su",
+             "ta", "ve", "ya", "zi", "ar", "el", "in", "on", "ur"]
+COMMON_WORDS = ["merhaba", "nasılsın", "bugün", "akşam", "evet", "hayır", "tamam", "çok", "iyi", "hello", "yes", "ok",
+                "thanks", "see", "you", "tomorrow", "the", "and", "what", "😂", "👍", "❤️", "haha", "bi", "ama"]
+LINKS = ["https://www.youtube.com/watch?v=dQw4w9WgXcQ", "http://us02web.zoom.us/j/123456", "www.example.org/a/b"]
+
+# media placeholders of the Android (Turkish and English) and iOS exports
+MEDIA = ["<Medya dahil edilmedi>", "<Media omitted>", "\u200eimage omitted", "\u200evideo omitted"]
+NOTIFICATIONS = ["{} gruba {} kişisini ekledi", "{} added {}", "{} left", "{} changed the group description"]
+
+
+def generate_chat(n_messages, time_format="Format1", n_users=50, seed=0):
+    """
+    Lines of a realistic synthetic export, always the same for the same arguments.
+    Users write with a skewed activity, words follow a Zipf-like distribution and the export contains
+    multi-line messages, links, emojis, media placeholders and group notifications
+
+    Parameters:
+      n_messages: number of messages of the chat
+      time_format: one of the keys of functions.DATETIME_FORMATS
+      n_users: number of users of the group
+      seed: seed of the random generator
+
+    Example:
+      with open("chat.txt", "w", encoding="utf-8") as chat_file:
+          chat_file.writelines(generate_chat(100000, "Format7"))
+    """
+    rng = random.Random(seed)
+    datetime_format = functions.DATETIME_FORMATS[time_format]
+    # the new exports have a no-break space before AM/PM
+    ampm_space = "\u202f" if time_format in ("Format14", "Format15") else " "
+
+    users = ["user_{}".format(i) if i % 3 else "+90 5{:02d} {:03d} {:02d} {:02d}".format(
+        i % 100, i * 7 % 1000, i % 97, i % 89) for i in range(n_users)]
+    user_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(n_users)))
+    vocabulary = COMMON_WORDS + ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(5000)]
+    word_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    date_time = datetime.datetime(2018, 1, 1, 8, 0)
+    for _ in range(n_messages):
+        date_time += datetime.timedelta(seconds=rng.choice([0, 5, 30, 60, 120, 600, 3600, 6 * 3600]))
+        header = date_time.strftime(datetime_format)
+        if "%p" in datetime_format:
+            header = header.replace(" AM", ampm_space + "AM").replace(" PM", ampm_space + "PM")
+
+        kind = rng.random()
+        user = rng.choices(users, cum_weights=user_weights)[0]
+        if kind < 0.02:
+            yield header + rng.choice(NOTIFICATIONS).format(user, rng.choice(users)) + "\n"
+        elif kind < 0.07:
+            yield header + user + ": " + rng.choice(MEDIA) + "\n"
+        else:
+            words = rng.choices(vocabulary, cum_weights=word_weights, k=rng.randint(1, 25))
+            if kind < 0.1:
+                words.append(rng.choice(LINKS))
+            if kind < 0.15:  # multi-line message, some lines look like "name: text"
+                yield header + user + ": " + " ".join(words) + "\nikinci satır: " + " ".join(words[::-1]) + "\n\n"
+            else:
+                yield header + user + ": " + " ".join(words) + "\n"
+
+
+def chat_file(data_dir, n_messages, time_format="Format1", seed=0):
+    """
+    Path of the generated chat, written only the first time it is asked for
+    """
+    path = os.path.join(data_dir, "chat_{}_{}_{}.txt".format(time_format, n_messages, seed))
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as generated:
+            generated.writelines(generate_chat(n_messages, time_format, seed=seed))
+        os.replace(tmp_path, path)
+    return path
+
+
+def measure(function, *args, memory=True):
+    """
+    Seconds spent in function(*args), its peak of allocated memory (MB, measured in a second call with tracemalloc)
+    and its output
+    """
+    gc.collect()
+    start = time.perf_counter()
+    output = function(*args)
+    seconds = time.perf_counter() - start
+    plt.close("all")
+
+    peak_mb = None
+    if memory:
+        del output
+        gc.collect()
+        tracemalloc.start()
+        output = function(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        plt.close("all")
+    return seconds, peak_mb, output
+
+
+def run(sizes, time_formats, names, data_dir, memory=True, log=sys.stderr):
+    """
+    Runs the benchmarks of the given names on the generated chats of every size and time format
+
+    Output:
+      results: dict of "{time_format}/{size}/{name}" -> {"seconds": ..., "peak_mb": ...}
+    """
+    results = {}
+    for time_format in time_formats:
+        for size in sizes:
+            path = chat_file(data_dir, SIZES[size], time_format)
+            seconds, peak_mb, df = measure(BENCHMARKS["txtToDf"], path, time_format, memory=memory)
+            measured = {"txtToDf": (seconds, peak_mb)}
+            for name in names:
+                if name != "txtToDf":
+                    measured[name] = measure(BENCHMARKS[name], df, memory=memory)[:2]
+            del df
+
+            for name in names:
+                seconds, peak_mb = measured[name]
+                key = "{}/{}/{}".format(time_format, size, name)
+                results[key] = {"seconds": seconds, "peak_mb": peak_mb}
+                print("{:<40} {:>9.3f}s {:>10}".format(
+                    key, seconds, "" if peak_mb is None else "{:.1f} MB".format(peak_mb)), file=log)
+    return results
+
+
+def check_formats(data_dir, n_messages=3000, time_formats=None, log=sys.stderr):
+    """
+    Parses a generated chat of every time format with the format detected automatically and checks that it gives the
+    same dates as the format itself. The 12-hour formats are also checked with the ÖÖ/ÖS markers of the Turkish exports
+
+    Output:
+      failures: dict of "time_format" (or "time_format/tr") -> error message
+
+    Example:
+      failures = check_formats("benchmark_data")
+    """
+    failures = {}
+    for time_format in time_formats or functions.DATETIME_FORMATS:
+        paths = {time_format: chat_file(data_dir, n_messages, time_format)}
+        if "%p" in functions.DATETIME_FORMATS[time_format]:
+            with open(paths[time_format], encoding="utf-8") as english:
+                turkish = english.read().replace(" AM", " ÖÖ").replace(" PM", " ÖS")
+            paths[time_format + "/tr"] = os.path.join(data_dir, "chat_{}_{}_tr.txt".format(time_format, n_messages))
+            with open(paths[time_format + "/tr"], "w", encoding="utf-8") as turkish_file:
+                turkish_file.write(turkish)
+
+        for name, path in paths.items():
+            try:
+                expected = functions.parse_chat(path, time_format)["date_time"]
+                for use_mmap in (False, True):
+                    detected = functions.parse_chat(path, "auto", use_mmap=use_mmap)["date_time"]
+                    if not detected.equals(expected):
+                        raise ValueError("the detected format gives other dates (use_mmap={})".format(use_mmap))
+            except Exception as error:
+                failures[name] = "{}: {}".format(type(error).__name__, error)
+            print("{:<20} {}".format(name, failures.get(name, "ok")), file=log)
+    return failures
+
+
+def compare(results, baseline, threshold=THRESHOLD, log=sys.stderr):
+    """
+    Prints the ratio of every result to the baseline
+
+    Output:
+      regressions: keys of the benchmarks that are slower or use more memory than the baseline by more than threshold
+        (times under MIN_SECONDS are not compared)
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratios = []
+        for metric in ("seconds", "peak_mb"):
+            if metric == "seconds" and max(result[metric], baseline[key][metric]) < MIN_SECONDS:
+                continue
+            if result[metric] is not None and baseline[key].get(metric):
+                ratios.append((metric, result[metric] / baseline[key][metric]))
+        regressed = any(ratio > threshold for _, ratio in ratios)
+        if regressed:
+            regressions.append(key)
+        print("{:<40} {} {}".format(key, "  ".join("{} x{:.2f}".format(metric, ratio) for metric, ratio in ratios),
+                                    "REGRESSION" if regressed else ""), file=log)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the time and peak memory of the analysis functions "
+                                                 "on generated chats of growing size")
+    parser.add_argument("-s", "--sizes", default="10k,100k", help="comma separated sizes of {} (default: 10k,100k)".format(
+        ",".join(SIZES)))
+    parser.add_argument("-f", "--formats", default="Format1",
+                        help="comma separated time formats, or all (default: Format1)")
+    parser.add_argument("-b", "--benchmarks", default=",".join(BENCHMARKS),
+                        help="comma separated functions to measure (default: all)")
+    parser.add_argument("--data-dir", default="benchmark_data",
+                        help="directory of the generated chats, reused between runs (default: benchmark_data)")
+    parser.add_argument("--no-memory", action="store_true", help="measure only the time (tracemalloc doubles the run)")
+    parser.add_argument("--save", help="write the results to this JSON file (eg. as the baseline)")
+    parser.add_argument("--compare", help="compare the results with this saved baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="ratio to the baseline that is a regression (default: {})".format(THRESHOLD))
+    parser.add_argument("--check-formats", action="store_true",
+                        help="only check that the time format of a chat of every format is detected automatically")
+    args = parser.parse_args(argv)
+
+    if args.check_formats:
+        return 1 if check_formats(args.data_dir) else 0
+
+    sizes = args.sizes.split(",")
+    time_formats = list(functions.DATETIME_FORMATS) if args.formats == "all" else args.formats.split(",")
+    names = args.benchmarks.split(",")
+    for value, known in [(sizes, SIZES), (time_formats, functions.DATETIME_FORMATS), (names, BENCHMARKS)]:
+        unknown = set(value) - set(known)
+        if unknown:
+            parser.error("unknown value(s): {}".format(", ".join(sorted(unknown))))
+
+    results = run(sizes, time_formats, names, args.data_dir, memory=not args.no_memory)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as saved:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "date": datetime.datetime.now().isoformat(timespec="seconds"), "results": results}, saved, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as saved:
+            baseline = json.load(saved)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
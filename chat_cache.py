@@ -0,0 +1,498 @@
+import io
+import os
+import json
+import time
+import hashlib
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import pandas as pd
+import functions
+import instrumentation
+
+# parsed chats are kept on disk as parquet files in this directory
+CACHE_DIR = os.environ.get("CHAT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "whatsapp_chat_analysis"))
+
+# the chats on disk that were not used for this many days are removed, then the least recently used ones until
+# the files of the others fit in this many MB (see evict_disk)
+DISK_CACHE_DAYS = float(os.environ.get("CHAT_CACHE_DAYS", "7"))
+DISK_CACHE_MB = float(os.environ.get("CHAT_CACHE_MB", "500"))
+
+# number of parsed chats that are kept in memory
+MEMORY_CACHE_SIZE = 8
+
+# changes whenever the parsed dataframe changes, so old parquet files are not read anymore
+CACHE_VERSION = "5"
+
+# number of rendered word clouds (png bytes) that are kept in memory
+CLOUD_CACHE_SIZE = 32
+
+# number of word clouds that are rendered at the same time
+CLOUD_WORKERS = 2
+
+# number of worker processes that parse several uploaded chats at the same time
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+# earlier exports of every chat (the number of messages stored and the last of them), so a re-export is only parsed from there on
+INDEX_FILE = "chats.json"
+
+_memory_cache = OrderedDict()
+_lock = threading.Lock()
+
+_parse_pool = None  # started on the first load_chats call that has more than one chat to parse
+
+_cloud_cache = OrderedDict()
+_cloud_renders = {}  # renders in progress, shared by everyone asking for the same word cloud
+_cloud_lock = threading.Lock()
+_cloud_pool = ThreadPoolExecutor(max_workers=CLOUD_WORKERS, thread_name_prefix="word_cloud")
+
+
+def chat_key(chat_file, time_format):
+    """
+    Hash of the raw bytes of the exported chat together with the time format. For a zip export only the
+    name, crc and size of its chat txt file are hashed, so the media files are not read
+
+    Parameters:
+      chat_file: path, bytes or binary file-like object of the exported chat (txt or zip)
+      time_format: the time format the chat is parsed with
+
+    Example:
+      key = chat_key("groupchat.txt", "Format1")
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update("{}|{}|".format(CACHE_VERSION, time_format).encode())
+
+    if functions.is_zip(chat_file):
+        with zipfile.ZipFile(io.BytesIO(chat_file) if isinstance(chat_file, (bytes, bytearray, memoryview))
+                             else chat_file) as archive:
+            member = functions.chat_member(archive)
+            digest.update("zip|{}|{}|{}".format(member.filename, member.CRC, member.file_size).encode())
+        _rewind(chat_file)
+    elif isinstance(chat_file, (bytes, bytearray, memoryview)):
+        digest.update(chat_file)
+    elif isinstance(chat_file, (str, os.PathLike)):
+        with open(chat_file, "rb") as raw_data:
+            for chunk in iter(lambda: raw_data.read(1 << 20), b""):
+                digest.update(chunk)
+    else:  # file-like object, read from the start and rewound for the parser
+        chat_file.seek(0)
+        for chunk in iter(lambda: chat_file.read(1 << 20), b""):
+            digest.update(chunk)
+        chat_file.seek(0)
+
+    return digest.hexdigest()
+
+
+def _parquet_path(key):
+    return os.path.join(CACHE_DIR, key + ".parquet")
+
+
+def _tokens_path(key):
+    return os.path.join(CACHE_DIR, key + ".tokens.npz")
+
+
+def _read_chat(key):
+    """
+    Parsed chat stored on disk: its dataframe and, if it was written, the token store of its messages
+    """
+    df = functions.ChatFrame(pd.read_parquet(_parquet_path(key)))
+    try:
+        os.utime(_parquet_path(key))  # the time of the last use, the least recently used chats are evicted first
+    except OSError:
+        pass
+    try:
+        tokens = functions.TokenStore.load(_tokens_path(key))
+    except (OSError, ValueError, KeyError):  # built from the messages on first use
+        tokens = None
+    if tokens is not None and len(tokens) != len(df):
+        tokens = None
+    return functions.ParsedChat(df, key, tokens)
+
+
+def _remember(key, chat):
+    with _lock:
+        _memory_cache[key] = chat
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _read_index():
+    try:
+        with open(os.path.join(CACHE_DIR, INDEX_FILE), encoding="utf-8") as index_file:
+            return json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(chat_id, entry):
+    with _lock:
+        index = _read_index()
+        index[chat_id] = entry
+        _save_index(index)
+
+
+def _save_index(index):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, INDEX_FILE)
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(index, index_file)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _chat_id(first_record, time_format):
+    """
+    Identity of a chat that stays the same in every export of it: its first message and its time format
+    (and the cache version, so the stored chats of an older parser are not continued)
+    """
+    return hashlib.blake2b(json.dumps([CACHE_VERSION, time_format, functions.message_fingerprint(first_record)]).encode(),
+                           digest_size=20).hexdigest()
+
+
+def _tracked(records, seen):
+    for record in records:
+        seen["last"] = record
+        seen["n_records"] += 1
+        yield record
+
+
+def _stored_chat(key):
+    """
+    Parsed chat of an earlier export, from the memory cache or from disk. It may be shared with other sessions,
+    so it is extended into a new chat (see functions.ParsedChat.appended) and left as it is
+    """
+    with _lock:
+        chat = _memory_cache.get(key)
+    if chat is None and os.path.exists(_parquet_path(key)):
+        chat = _read_chat(key)
+    return chat
+
+
+def _parse_chat(chat_file, time_format, incremental):
+    """
+    Parses the exported chat. When an earlier export of the same chat is stored and this one starts with the same
+    messages, only the messages after them are parsed and appended to a copy of the stored chat
+
+    Output:
+      chat: functions.ParsedChat
+      chat_id, position: identity of the chat, and the fingerprint of its last message ("last") with the number of
+        messages read ("n_records"), as they are kept in the index (None for an empty chat)
+    """
+    seen = {"last": None, "n_records": 0}
+    tokens = functions.TokenStore()  # the words of the parsed messages, tokenized once while parsing
+    with functions.open_chat(chat_file) as stream:
+        lines, time_format = functions.resolve_format(stream, time_format)
+        records = functions.iter_records(lines, time_format)
+        first = next(records, None)
+        if first is None:
+            return functions.ParsedChat(functions.parse_records([], time_format, tokens=tokens), tokens=tokens), None, None
+        chat_id = _chat_id(first, time_format)
+
+        entry = _read_index().get(chat_id) if incremental else None
+        chat = _stored_chat(entry["key"]) if entry and "n_records" in entry else None
+        if chat is not None:
+            # skipping exactly the messages that are already stored, the last of them has to be the stored last message
+            # (an earlier message of the same minute, user and text, eg. "ok" sent twice, is not taken for it)
+            n_records = entry["n_records"]
+            with instrumentation.stage("skip_known_messages"):
+                known = first if n_records == 1 else next(itertools.islice(records, n_records - 2, None), None)
+                found = known is not None and functions.message_fingerprint(known) == tuple(entry["last"])
+            if found:
+                seen = {"last": known, "n_records": n_records}
+                chat = chat.appended(functions.parse_records(_tracked(records, seen), time_format, tokens=tokens), tokens)
+                return chat, chat_id, _position(seen)
+        else:
+            df = functions.parse_records(_tracked(itertools.chain([first], records), seen), time_format, tokens=tokens)
+            return functions.ParsedChat(df, tokens=tokens), chat_id, _position(seen)
+
+    # the stored messages are not at the start of this export (eg. the chat history was cleared), it is parsed as a new chat
+    _rewind(chat_file)
+    chat, _, position = _parse_chat(chat_file, time_format, incremental=False)
+    return chat, chat_id, position
+
+
+def _position(seen):
+    return {"last": functions.message_fingerprint(seen["last"]), "n_records": seen["n_records"]}
+
+
+def _rewind(chat_file):
+    if hasattr(chat_file, "seek"):
+        chat_file.seek(0)
+
+
+def load_chat(chat_file, time_format, incremental=True):
+    """
+    Parsed chat, looked up by the hash of the raw bytes and the time format
+    in memory (LRU), then on disk (parquet), and parsed only when it has never been seen.
+    The tables derived from the chat (eg. chat.cube) stay in memory with it
+
+    A re-export of a stored chat (recognized by its first message) repeats its whole history, so only the
+    messages after the stored ones are parsed; they are appended to a copy of the stored chat and the
+    tables already built from it are updated from the new messages only
+
+    Parameters:
+      chat_file: path, bytes or binary file-like object of the exported chat (txt or zip, see functions.open_chat)
+      time_format: the time format of the export (see functions.SPLIT_FORMATS)
+      incremental: False to parse the whole export even when an earlier export of the chat is stored
+
+    Output:
+      chat: functions.ParsedChat, shared between callers so chat.df shouldn't be modified in place
+
+    Example:
+      chat = load_chat("group_chat_data.txt", "Format1")
+      df = chat.df
+    """
+    with instrumentation.stage("hash"):
+        key = chat_key(chat_file, time_format)
+
+    with _lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+
+    path = _parquet_path(key)
+    if os.path.exists(path):
+        with instrumentation.stage("read_parquet") as read:
+            chat = _read_chat(key)
+            read.rows = len(chat.df)
+        evict_disk(keep=key)
+    else:
+        with instrumentation.stage("parse_chat") as parsed:
+            chat, chat_id, position = _parse_chat(chat_file, time_format, incremental)
+            parsed.rows = len(chat.df)
+        chat.key = key
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+            with instrumentation.stage("write_parquet", len(chat.df)):
+                # the token store first, so a chat on disk always has the store of its own messages or none
+                if "tokens" in chat.__dict__:
+                    chat.tokens.save(tmp_path)
+                    os.replace(tmp_path, _tokens_path(key))
+                chat.df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)  # readers never see a half written file
+        except OSError:  # read-only or full disk, the memory cache still works
+            pass
+        else:
+            if chat_id is not None:
+                _write_index(chat_id, dict(position, key=key))
+            evict_disk(keep=key)
+
+    _remember(key, chat)
+    return chat
+
+
+def _parse_to_disk(chat_file, time_format):
+    """
+    Parses the chat in a worker process, the parsed chat is passed back through its parquet file
+    """
+    return load_chat(chat_file, time_format).key
+
+
+def _parse_workers():
+    global _parse_pool
+    with _lock:
+        if _parse_pool is None:
+            # spawn: forking the multi-threaded app server is not safe
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def _reset_workers(pool):
+    global _parse_pool
+    with _lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False)
+
+
+def load_chats(chat_files, time_format="auto"):
+    """
+    Several parsed chats at once. The chats that are not in the cache yet are parsed at the same time on a pool of
+    worker processes (each export is independent), the others come from the cache with the tables already built from them
+
+    Parameters:
+      chat_files: list of paths, bytes or binary file-like objects of the exported chats
+      time_format: the time format of the exports, "auto" to detect it for each one
+
+    Output:
+      chats: list of functions.ParsedChat in the order of chat_files, or the exception raised while parsing that chat
+
+    Example:
+      family, work = load_chats(["family.txt", "work.zip"])
+    """
+    keys = {}
+    for i, chat_file in enumerate(chat_files):
+        try:
+            keys[i] = chat_key(chat_file, time_format)
+        except OSError:  # raised again by load_chat below
+            pass
+    with _lock:
+        missing = [i for i, key in keys.items() if key not in _memory_cache and not os.path.exists(_parquet_path(key))]
+
+    parsed = {}
+    if len(missing) > 1:
+        pool = _parse_workers()
+        for i in missing:
+            chat_file = chat_files[i]
+            if not isinstance(chat_file, (str, os.PathLike, bytes)):  # uploaded file objects can't be sent to the workers
+                chat_file = chat_file.getvalue() if hasattr(chat_file, "getvalue") else chat_file.read()
+            try:
+                parsed[i] = pool.submit(_parse_to_disk, chat_file, time_format)
+            except BrokenProcessPool:  # the chats that are left are parsed here, the pool is started again next time
+                _reset_workers(pool)
+                break
+
+    chats = []
+    for i, chat_file in enumerate(chat_files):
+        try:
+            if i in parsed:
+                try:
+                    parsed[i].result()  # raises the error of the worker
+                except BrokenProcessPool:  # a worker died, the pool is started again next time
+                    _reset_workers(pool)
+            _rewind(chat_file)
+            chats.append(load_chat(chat_file, time_format))  # from the parquet file written by the worker
+        except Exception as error:
+            chats.append(error)
+    return chats
+
+
+def evict_disk(keep=None, max_days=None, max_mb=None):
+    """
+    Removes the chats on disk (parquet and token store files, and their entries in the index) that were not used for
+    max_days, then the least recently used ones until the others fit in max_mb. Called whenever a chat is written
+    or read from disk, so the exported chats are not kept forever and the disk use stays bounded
+
+    Parameters:
+      keep: key of a chat that is kept anyway (the one just loaded)
+      max_days, max_mb: limits of the cache, DISK_CACHE_DAYS and DISK_CACHE_MB by default
+
+    Example:
+      evict_disk(max_days=1)
+    """
+    max_age = (DISK_CACHE_DAYS if max_days is None else max_days) * 86400
+    max_size = (DISK_CACHE_MB if max_mb is None else max_mb) * 2 ** 20
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    stored = []
+    for name in names:
+        if name.endswith(".parquet"):
+            key = name[:-len(".parquet")]
+            try:
+                used = os.path.getmtime(_parquet_path(key))
+                size = sum(os.path.getsize(path) for path in [_parquet_path(key), _tokens_path(key)] if os.path.exists(path))
+            except OSError:  # removed meanwhile
+                continue
+            stored.append((used, key, size))
+
+    now, total, removed = time.time(), 0, set()
+    for used, key, size in sorted(stored, reverse=True):  # the most recently used first
+        if key != keep and (now - used > max_age or total + size > max_size):
+            for path in [_parquet_path(key), _tokens_path(key)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            removed.add(key)
+        else:
+            total += size
+    if removed:
+        with _lock:
+            index = _read_index()
+            _save_index({chat_id: entry for chat_id, entry in index.items() if entry.get("key") not in removed})
+
+
+def clear_cache(disk=False):
+    """
+    Empties the memory cache and optionally removes the parquet and token store files (all of CACHE_DIR's chats)
+
+    Example:
+      clear_cache(disk=True)
+    """
+    with _lock:
+        _memory_cache.clear()
+    if disk and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith((".parquet", ".npz")) or name == INDEX_FILE:
+                os.remove(os.path.join(CACHE_DIR, name))
+
+
+def _render_cloud(counts, width, height, stopwords):
+    image = functions.word_cloud_frequencies(counts, width, height, stopwords)
+    png = io.BytesIO()
+    image.save(png, format="PNG")
+    return png.getvalue()
+
+
+def _cloud_done(key, render):
+    with _cloud_lock:
+        _cloud_renders.pop(key, None)
+        if render.exception() is None:
+            _cloud_cache[key] = render.result()
+            while len(_cloud_cache) > CLOUD_CACHE_SIZE:
+                _cloud_cache.popitem(last=False)
+
+
+def _known_cloud(key):
+    """
+    Future of a cloud that is rendered or being rendered, None otherwise (called with _cloud_lock held)
+    """
+    if key in _cloud_cache:
+        _cloud_cache.move_to_end(key)
+        render = Future()
+        render.set_result(_cloud_cache[key])
+        return render
+    return _cloud_renders.get(key)
+
+
+def word_cloud_png(chat, user=None, width=1200, height=800, stopwords=functions.CLOUD_STOPWORDS, start=None, end=None):
+    """
+    Word cloud of the group (or of one user) as png bytes, rendered on a worker thread.
+    Rendered clouds are kept in an LRU keyed by chat, user, date range, stopwords and size, and the same cloud is
+    rendered only once even when several sessions ask for it at the same time
+
+    Parameters:
+      chat: functions.ParsedChat of load_chat, its key tells the clouds of different chats apart
+      user: the user whose words are drawn, None for the whole group
+      width, height: size of the image
+      stopwords: words that are left out of the cloud
+      start, end: dates of the messages whose words are drawn (both included), None for the whole chat
+
+    Output:
+      future whose result() is the png bytes, so the rest of the page can be drawn while it renders
+
+    Example:
+      cloud = word_cloud_png(chat)
+      st.image(cloud.result())
+    """
+    if chat.key is None:
+        raise ValueError("The word clouds are cached by the content key of the chat, load it with load_chat")
+    stopwords = frozenset(stopwords)
+    key = (chat.key, user, start, end, stopwords, width, height)
+
+    with _cloud_lock:
+        render = _known_cloud(key)
+    if render is not None:
+        return render
+
+    # counted without the lock, the first count of a chat may tokenize all of its messages
+    counts = chat.period_word_frequencies(start, end, user)  # a bincount of the token store
+    with _cloud_lock:
+        render = _known_cloud(key)  # the same cloud may have been asked for meanwhile
+        if render is not None:
+            return render
+        render = _cloud_pool.submit(_render_cloud, counts, width, height, stopwords)
+        _cloud_renders[key] = render
+    render.add_done_callback(lambda done: _cloud_done(key, done))
+    return render
@@ -1,28 +1,1008 @@
+import io
+import os
 import re
 import datetime
+import contextlib
+import functools
+import hashlib
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from wordcloud import WordCloud, STOPWORDS
 import itertools
+import mmap
+import zipfile
 from collections import Counter
 import warnings
+import instrumentation
 
 warnings.filterwarnings('ignore')
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', 500)
 
 
-def txtToDf(chat_file, time_format):
+# Depending on date format of exported txt file, format of the date-time header of every message
+# (the format changes according to the phone language and model)
+DATETIME_FORMATS = {
+    "Format1": "%d.%m.%Y %H:%M - ",  # DD.MM.YYYY HH:MM
+    "Format2": "%d/%m/%Y, %H:%M - ",  # DD/MM/YYYY, HH:MM
+    "Format3": "[%d.%m.%Y %H:%M:%S] ",  # [DD.MM.YYYY HH:MM:SS]
+    "Format4": "%d.%m.%y %H:%M - ",  # DD.MM.YY HH:MM
+    "Format5": "%d/%m/%y, %H:%M - ",  # DD/MM/YY, HH:MM
+    "Format6": "%m/%d/%y, %H:%M - ",  # MM/DD/YY, HH:MM
+    "Format7": "%d/%m/%Y, %I:%M %p - ",  # DD/MM/YYYY, HH:MM AM
+    "Format8": "%m/%d/%Y, %I:%M %p - ",  # MM/DD/YYYY, HH:MM AM
+    "Format9": "%d/%m/%y, %I:%M %p - ",  # DD/MM/YY, HH:MM AM
+    "Format10": "%m/%d/%y, %I:%M %p - ",  # MM/DD/YY, HH:MM AM
+    "Format11": "[%d.%m.%y, %H:%M:%S] ",  # [DD.MM.YY, HH:MM:SS] (iOS)
+    "Format12": "[%d/%m/%Y, %H:%M:%S] ",  # [DD/MM/YYYY, HH:MM:SS] (iOS)
+    "Format13": "[%d/%m/%y, %H:%M:%S] ",  # [DD/MM/YY, HH:MM:SS] (iOS)
+    "Format14": "[%d/%m/%y, %I:%M:%S %p] ",  # [DD/MM/YY, HH:MM:SS AM] (iOS)
+    "Format15": "[%m/%d/%y, %I:%M:%S %p] ",  # [MM/DD/YY, HH:MM:SS AM] (iOS)
+}
+
+# regex of every strftime directive used in DATETIME_FORMATS
+_DIRECTIVE_PATTERNS = {
+    "%d": r"\d{1,2}", "%m": r"\d{1,2}", "%Y": r"\d{4}", "%y": r"\d{2}",
+    "%H": r"\d{1,2}", "%I": r"\d{1,2}", "%M": r"\d{2}", "%S": r"\d{2}",
+    "%p": r"(?:[AaPp][Mm]|ÖÖ|ÖS|öö|ös)",  # AM/PM, ÖÖ/ÖS of the Turkish exports (no class, it is also used on bytes)
+}
+
+# the Turkish AM/PM markers, replaced by the ones strptime reads (see _clean_header)
+_MERIDIEM_MARKERS = {"ÖÖ": "AM", "öö": "AM", "ÖS": "PM", "ös": "PM"}
+
+
+def _header_pattern(datetime_format):
+    """
+    Regex of the date-time header written with the given datetime format (spaces may also be the no-break spaces of iOS and new Android exports)
+    """
+    parts = re.split("(%[a-zA-Z])", datetime_format)
+    return "\u200e?" + "".join(_DIRECTIVE_PATTERNS[part] if part in _DIRECTIVE_PATTERNS
+                                 else re.escape(part).replace("\\ ", "[ \u202f\u00a0]") for part in parts)
+
+
+def _header_pattern_bytes(datetime_format):
+    """
+    _header_pattern for the utf-8 bytes of the export, the no-break spaces are multi-byte so they are alternatives instead of a class
+    """
+    parts = re.split("(%[a-zA-Z])", datetime_format)
+    pattern = "(?:\u200e)?" + "".join(_DIRECTIVE_PATTERNS[part] if part in _DIRECTIVE_PATTERNS
+                                      else re.escape(part).replace("\\ ", "(?: |\u202f|\u00a0)") for part in parts)
+    return pattern.encode("utf-8")
+
+
+# regex of the date-time header of every format, a message starts with it
+SPLIT_FORMATS = {name: _header_pattern(datetime_format) for name, datetime_format in DATETIME_FORMATS.items()}
+
+# the same headers at the start of a line of the raw bytes (after an optional BOM), used by the memory-mapped parser
+SPLIT_FORMATS_BYTES = {name: re.compile(rb"(?m)^(?:\xef\xbb\xbf)?(" + _header_pattern_bytes(datetime_format) + rb")")
+                       for name, datetime_format in DATETIME_FORMATS.items()}
+
+# number of characters at the start of the chat that are used to detect its format
+SNIFF_SIZE = 8192
+
+# number of characters after the sample that are read at most (and kept for the parser) to settle DD/MM vs MM/DD,
+# a chat that is still ambiguous after them is settled while it is parsed (see parse_records)
+SETTLE_SIZE = 1 << 20
+
+# {user_name}: {message} split of a message, messages without it are group notifications
+USER_MSG_PATTERN = re.compile(r"^([\w\W]+?):\s([\w\W]*)$")
+
+# names of the days and months, indexed by dt.weekday and dt.month - 1
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+DAY_DTYPE = pd.CategoricalDtype(DAY_NAMES, ordered=True)
+MONTH_DTYPE = pd.CategoricalDtype(MONTH_NAMES, ordered=True)
+
+# time variables derived from date_time, all with vectorized datetime64 operations
+CALENDAR_COLUMNS = {
+    "date": lambda dt: dt.dt.normalize(),  # ex. 2022-09-20
+    "year": lambda dt: dt.dt.year.astype("int16"),  # ex. 2022
+    "month_n": lambda dt: dt.dt.month.astype("int8"),  # month_numeric ex. 8
+    "month_t": lambda dt: pd.Series(pd.Categorical.from_codes(dt.dt.month.values - 1, dtype=MONTH_DTYPE), index=dt.index),  # month_text ex. Mar
+    "day_n": lambda dt: dt.dt.day.astype("int8"),  # day_numeric ex. 14
+    "day_of_week": lambda dt: (dt.dt.weekday + 1).astype("int8"),  # for Mon: 1 - Sun: 7 (org. Mon: 0 - Sun: 6)
+    "day_t": lambda dt: pd.Series(pd.Categorical.from_codes(dt.dt.weekday.values, dtype=DAY_DTYPE), index=dt.index),  # day_text, ex. Tue
+    "time": lambda dt: dt - dt.dt.normalize(),  # time of the day, ex. 22:10:00
+    "hour": lambda dt: dt.dt.hour.astype("int8"),  # ex. 22
+    "minute": lambda dt: dt.dt.minute.astype("int8"),  # ex. 08
+}
+
+# dtypes of the parsed chat dataframe, the calendar columns are added on first access (see ChatFrame)
+CHAT_SCHEMA = {
+    "date_time": "datetime64[ns]",
+    "user": "category",
+    "message": "object",
+    "len_message": "int32",
+    "n_words": "int32",
+    "n_links": "int16",
+    "n_emoji": "int16",
+    "n_mentions": "int16",
+    "domains": "category",
+    "emoji": "category",
+    "date": "datetime64[ns]",
+    "year": "int16",
+    "month_n": "int8",
+    "month_t": MONTH_DTYPE,
+    "day_n": "int8",
+    "day_of_week": "int8",
+    "day_t": DAY_DTYPE,
+    "time": "timedelta64[ns]",
+    "hour": "int8",
+    "minute": "int8",
+}
+
+# words of the word cloud: lowercase, starting with a letter or digit (same as the WordCloud tokenizer)
+WORD_PATTERN = re.compile(r"\w[\w']*")
+
+# the words and the line breaks between the messages of a batch (see TokenStore.add)
+_WORDS_AND_BREAKS = re.compile(r"\n|" + WORD_PATTERN.pattern)
+
+# links that are removed from the messages, up to the next space as before the tokenizer,
+# with their domain (without the www. prefix) as the group
+LINK_PATTERN = re.compile(r"(?:https?://(?:www\d*\.)?|www\.)([^/?#:\s]+)\S*")
+
+# @mentions, also the "@\u2068name\u2069" form of the new exports, but not the @ of an e-mail address
+MENTION_PATTERN = re.compile(r"@(?<!\w@)(?:\u2068[^\u2069\n]*\u2069|\w+)")
+
+# one emoji: a pair of regional indicators (a flag) or a pictograph, with its variation selectors and skin tones,
+# and the pictographs joined to it with zero width joiners (eg. family and profession emoji)
+_EMOJI_BASE = r"[\U0001F000-\U0001FAFF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF]"
+_EMOJI_MODIFIERS = r"[\uFE0F\U0001F3FB-\U0001F3FF]*"
+# (the pattern starts with one character class, which re scans for quickly)
+EMOJI_PATTERN = re.compile(r"{0}(?:(?<=[\U0001F1E6-\U0001F1FF])[\U0001F1E6-\U0001F1FF])?{1}(?:\u200D{0}{1})*".format(
+    _EMOJI_BASE, _EMOJI_MODIFIERS))
+
+
+# words that are left out of the word cloud
+CLOUD_STOPWORDS = frozenset(STOPWORDS) | {"bi", "us", "j", "us02web", "silindi", "com", "www",
+                                          "ya", "ile", 'medya', 'dahil', 'edilmedi', 'zoom',
+                                          'https', "ama", "bu", "da", "mi", "gibi", "için", "ve", "de"}
+
+# number of messages that are turned into a dataframe at once while parsing
+BATCH_SIZE = 100000
+
+# levels of the conversation history (see history_pyramid), finest first, with their pandas frequencies
+HISTORY_LEVELS = {"day": "D", "week": "W-MON", "month": "MS"}
+
+# the automatic level of the history plot is the finest one with at most this many points
+HISTORY_MAX_POINTS = 400
+
+# messages that are written by WhatsApp instead of a user, by language of the phone: media placeholders of the
+# Android and iOS exports, deleted messages... Each rule is a regex that matches the whole message (case-insensitive,
+# after an optional left-to-right mark), a language is added by adding its rules, eg. SYSTEM_MESSAGE_RULES["de"] = [...]
+SYSTEM_MESSAGE_RULES = {
+    "tr": [
+        r"<medya dahil edilmedi>",
+        r"(görüntü|video|ses|çıkartma|gif|belge|kişi kartı) dahil edilmedi",
+        r"bu mesaj silindi",
+        r"bu mesajı sildiniz",
+    ],
+    "en": [
+        r"<media omitted>",
+        r"(image|video|audio|sticker|gif|document|contact card) omitted",
+        r"this message was deleted",
+        r"you deleted this message",
+    ],
+}
+
+# languages of SYSTEM_MESSAGE_RULES whose messages are dropped while parsing
+SYSTEM_MESSAGE_LANGUAGES = ("tr", "en")
+
+# system messages are never longer than this many characters, the longer messages are not matched with the rules
+SYSTEM_MESSAGE_MAX_LENGTH = 64
+
+# a new conversation starts when nobody has written for longer than this (see conversation_sessions)
+SESSION_GAP = pd.Timedelta(hours=1)
+
+# a message is a reply to the previous one when it is written by another user within this time (see ReplyGraph)
+REPLY_WINDOW = pd.Timedelta(minutes=10)
+
+# names of the values returned by df_general_stats, in order
+GENERAL_STATS = ["n_users", "n_messages", "n_days", "avg_message_per_day", "avg_message_per_user",
+                 "max_len_message", "min_len_message", "avg_len_message", "user_max_len_message",
+                 "n_words", "max_word_message", "min_word_message", "avg_words"]
+
+# counts of every message taken by tokenize_messages, summed over date ranges by RangeTotals
+TOKEN_COUNTS = ["n_links", "n_emoji", "n_mentions"]
+
+
+def is_zip(chat_file):
+    """
+    True if the exported chat is a zip archive (the export with or without media), from its first bytes
+
+    Example:
+      is_zip("WhatsApp Chat - Family.zip")
+    """
+    if isinstance(chat_file, (bytes, bytearray, memoryview)):
+        return bytes(chat_file[:4]) == b"PK\x03\x04"
+    if isinstance(chat_file, (str, os.PathLike)):
+        with open(chat_file, "rb") as raw_data:
+            return raw_data.read(4) == b"PK\x03\x04"
+    if isinstance(chat_file, io.TextIOBase):
+        return False
+    position = chat_file.tell()
+    magic = chat_file.read(4)
+    chat_file.seek(position)
+    return magic == b"PK\x03\x04"
+
+
+def chat_member(archive):
+    """
+    The chat txt file of a zip export: _chat.txt of iOS exports, otherwise the (largest) txt file of Android exports.
+    Media files are never read
+
+    Parameters:
+      archive: zipfile.ZipFile of the export
+
+    Output:
+      info: zipfile.ZipInfo of the chat txt file
+
+    Example:
+      with zipfile.ZipFile("export.zip") as archive:
+          print(chat_member(archive).filename)
+    """
+    texts = [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith(".txt")]
+    if not texts:
+        raise ValueError("The zip file has no chat txt file")
+    for info in texts:
+        if os.path.basename(info.filename) == "_chat.txt":
+            return info
+    return max(texts, key=lambda info: info.file_size)
+
+
+@contextlib.contextmanager
+def open_chat(chat_file):
+    """
+    Opens the exported chat as a text stream that can be read line by line
+
+    Parameters:
+      chat_file: path of the txt or zip file, its content as bytes or a file-like object (text or binary).
+        Binary file objects (eg. the streamlit uploaded file) are decoded incrementally, not as a whole.
+        Only the chat txt file of a zip export is decompressed (see chat_member), as it is read.
+
+    Example:
+      with open_chat("groupchat.txt") as stream:
+          first_line = stream.readline()
+    """
+    if isinstance(chat_file, (bytes, bytearray, memoryview)):
+        chat_file = io.BytesIO(chat_file)
+
+    if not isinstance(chat_file, io.TextIOBase) and is_zip(chat_file):
+        with zipfile.ZipFile(chat_file) as archive, archive.open(chat_member(archive)) as member:
+            yield io.TextIOWrapper(member, encoding="utf-8-sig")
+    elif isinstance(chat_file, (str, os.PathLike)):
+        with open(chat_file, "r", encoding="utf-8-sig") as stream:
+            yield stream
+    elif isinstance(chat_file, io.TextIOBase):
+        yield chat_file
+    else:
+        stream = io.TextIOWrapper(chat_file, encoding="utf-8-sig")
+        try:
+            yield stream
+        finally:
+            stream.detach()  # the caller's file object must stay open
+
+
+def _valid_header(line, time_format):
+    """
+    True if the line starts with the header of the time format and the header is a valid date in it
+    """
+    match = re.match(SPLIT_FORMATS[time_format], line)
+    if match is None:
+        return False
+    try:
+        datetime.datetime.strptime(_clean_header(match.group()), DATETIME_FORMATS[time_format])
+    except ValueError:
+        return False
+    return True
+
+
+def sniff_formats(sample):
+    """
+    The time formats that fit a sample of the first lines of the exported chat best
+
+    Every format of DATETIME_FORMATS is scored by the number of lines that start with its header and
+    whose header is a valid date in it. Several formats have the best score when the sample can't tell them apart,
+    eg. DD/MM and MM/DD when every day of the sample is at most 12 (DD/MM comes first)
+
+    Output:
+      time_formats: list of keys of DATETIME_FORMATS, empty if no line starts with a known header
+
+    Example:
+      sniff_formats("01/02/22, 10:00 - a: hi\n")  # ["Format5", "Format6"]
+    """
+    lines = sample.splitlines()
+    scores = {time_format: sum(_valid_header(line, time_format) for line in lines) for time_format in DATETIME_FORMATS}
+    best_score = max(scores.values())
+    return [time_format for time_format, score in scores.items() if score == best_score] if best_score else []
+
+
+def sniff_format(sample):
+    """
+    Detects the time format of the exported chat from a sample of its first lines (see sniff_formats),
+    DD/MM wins over MM/DD when the sample can't tell them apart (see settle_format)
+
+    Output:
+      time_format: key of DATETIME_FORMATS, None if no line starts with a known header
+
+    Example:
+      sniff_format(open("groupchat.txt", encoding="utf-8").read(8192))
+    """
+    time_formats = sniff_formats(sample)
+    return time_formats[0] if time_formats else None
+
+
+def settle_format(time_formats, lines):
+    """
+    Chooses between formats that fit the sample equally well by reading the lines after it until a header is valid in
+    only some of them (eg. a day after the 12th), the first format is kept if no line settles it
+
+    Parameters:
+      time_formats: the best formats of sniff_formats
+      lines: iterable of the lines after the sample, read only as far as needed
+
+    Example:
+      settle_format(["Format5", "Format6"], ["12/01/22, 10:00 - a: hi", "01/13/22, 10:00 - b: hi"])  # "Format6"
+    """
+    for line in lines:
+        if len(time_formats) == 1:
+            break
+        valid = [time_format for time_format in time_formats if _valid_header(line, time_format)]
+        if valid:
+            time_formats = valid
+    return time_formats[0]
+
+
+def swapped_format(time_format):
+    """
+    The format of DATETIME_FORMATS with the same header but the day and the month swapped (DD/MM <-> MM/DD), or None
+    """
+    swapped = DATETIME_FORMATS[time_format].replace("%d", "\0").replace("%m", "%d").replace("\0", "%m")
+    return next((name for name, datetime_format in DATETIME_FORMATS.items()
+                 if datetime_format == swapped and name != time_format), None)
+
+
+def _clean_header(date_time):
+    """
+    Header with plain spaces, as the datetime formats expect them
+    """
+    if date_time.isascii():
+        return date_time
+    date_time = date_time.replace("\u202f", " ").replace("\u00a0", " ").replace("\u200e", "")
+    for marker, meridiem in _MERIDIEM_MARKERS.items():
+        date_time = date_time.replace(marker, meridiem)
+    return date_time
+
+
+def resolve_format(stream, time_format):
+    """
+    Lines of the stream and its time format, "auto" is detected from the first SNIFF_SIZE characters without losing them.
+    Raises ValueError when the format can't be detected, or when no line of the sample starts with the header of the
+    given format (eg. a DD.MM.YYYY export read as DD/MM/YYYY)
+    """
+    sample = stream.read(SNIFF_SIZE) + stream.readline()  # complete the last line of the sample
+    if time_format != "auto":
+        header = re.compile(SPLIT_FORMATS[time_format])
+        if sample and not any(header.match(line) for line in sample.splitlines()):
+            raise ValueError("No message of the chat starts with a date of the format {}".format(time_format))
+        return itertools.chain(io.StringIO(sample), stream), time_format
+
+    detected = sniff_formats(sample)
+    if not detected:
+        raise ValueError("The date format of the chat could not be detected")
+    read = []  # the lines read past the sample to settle the format, given back to the parser
+    time_format = settle_format(detected, _read_lines(stream, read, SETTLE_SIZE)) if len(detected) > 1 else detected[0]
+    return itertools.chain(io.StringIO(sample), read, stream), time_format
+
+
+def _read_lines(stream, read, size):
+    # the lines of the stream up to about size characters, kept in read
+    for line in stream:
+        read.append(line)
+        yield line
+        size -= len(line)
+        if size <= 0:
+            return
+
+
+def iter_records(lines, time_format):
+    """
+    (date_time, user_msg) record of every message of the given lines
+    """
+    header = re.compile(SPLIT_FORMATS[time_format])
+
+    date_time = None
+    message_lines = []
+    for line in lines:
+        match = header.match(line)
+        if match:  # a new message starts
+            if date_time is not None:
+                yield date_time, " ".join(message_lines)
+            date_time = _clean_header(match.group())
+            message_lines = [line[match.end():].rstrip("\r\n")]
+        elif date_time is not None:  # continuation of a multi-line message
+            message_lines.append(line.rstrip("\r\n"))
+    if date_time is not None:
+        yield date_time, " ".join(message_lines)
+
+
+def message_fingerprint(record):
+    """
+    (date_time, user, content hash) of a (date_time, user_msg) record, used to find a known message again in a newer export
+
+    Example:
+      message_fingerprint(("20.09.2022 22:10 - ", "6udcaAqLvO: hello"))
+    """
+    date_time, user_msg = record
+    match = USER_MSG_PATTERN.match(user_msg)
+    user, message = match.groups() if match else ("group_notification", user_msg)
+    return date_time, user, hashlib.blake2b(message.encode(), digest_size=8).hexdigest()
+
+
+def system_message_pattern(languages=SYSTEM_MESSAGE_LANGUAGES):
+    """
+    Regex of the messages of SYSTEM_MESSAGE_RULES of the given languages
+
+    Example:
+      system_message_pattern(["en"]).match("<Media omitted>")
+    """
+    rules = [rule for language in languages for rule in SYSTEM_MESSAGE_RULES[language]]
+    if not rules:
+        return re.compile(r"(?!)")  # matches nothing
+    return re.compile(r"\u200e?\s*(?:{})\s*$".format("|".join(rules)), re.IGNORECASE)
+
+
+def keep_mask(df, languages=SYSTEM_MESSAGE_LANGUAGES):
+    """
+    Boolean mask of the messages that are kept: not empty, not a group notification and not a system message
+    of the given languages (see SYSTEM_MESSAGE_RULES), so the dataframe is filtered with one copy
+
+    Example:
+      df = df[keep_mask(df)].reset_index(drop=True)
+    """
+    lengths = df["message"].str.len().values
+    mask = (lengths > 0) & (df["user"] != "group_notification").values
+    if languages:
+        pattern = system_message_pattern(languages)
+        # only the short messages that are still kept can be system messages
+        candidates = np.flatnonzero(mask & (lengths <= SYSTEM_MESSAGE_MAX_LENGTH))
+        messages = df["message"].values
+        mask[candidates] = [pattern.match(messages[i]) is None for i in candidates]
+    return mask
+
+
+def drop_system_records(records, languages=SYSTEM_MESSAGE_LANGUAGES):
+    """
+    The (date_time, user_msg) records without the group notifications and the system messages of the given languages,
+    to filter a stream of records before it is turned into a dataframe
+
+    Example:
+      records = drop_system_records(iter_messages("groupchat.txt", "Format1"))
+    """
+    pattern = system_message_pattern(languages)
+    for record in records:
+        match = USER_MSG_PATTERN.match(record[1])
+        if match is not None and not pattern.match(match.group(2)):
+            yield record
+
+
+def iter_messages(chat_file, time_format="auto", languages=None):
+    """
+    Reads the exported chat line by line and yields every message as soon as the next date-time header is found
+
+    Parameters:
+      chat_file: path, bytes or file-like object of the exported chat (see open_chat)
+      time_format: one of the keys of DATETIME_FORMATS, "auto" to detect it from the first lines
+      languages: languages of SYSTEM_MESSAGE_RULES whose system messages (and the group notifications) are skipped,
+        None to yield every message
+
+    Output:
+      (date_time, user_msg) tuples, multi-line messages are joined with a space
+
+    Example:
+      for date_time, user_msg in iter_messages("groupchat.txt", "Format1"):
+          print(date_time, user_msg)
+    """
+    with open_chat(chat_file) as stream:
+        lines, time_format = resolve_format(stream, time_format)
+        records = iter_records(lines, time_format)
+        yield from records if languages is None else drop_system_records(records, languages)
+
+
+def _int16(values):
+    return np.minimum(np.array(values, dtype=np.int32), np.iinfo(np.int16).max).astype(np.int16)
+
+
+def tokenize_messages(messages):
+    """
+    Finds the links, @mentions and emoji of the messages and removes the links from them, then counts the characters
+    of what is left (the words are counted by TokenStore.add). The messages are single lines (see iter_records), so they are joined by line breaks
+    and every kind of token is found with one regex pass over the whole batch instead of one call per message
+
+    Parameters:
+      messages: sequence of messages
+
+    Output:
+      columns: dict of column -> one value per message: the text without links ("message"), its number of characters
+        ("len_message"), the number of links, emoji and mentions ("n_links", "n_emoji", "n_mentions")
+        and the domains of the links and the emoji, separated by spaces ("domains", "emoji")
+
+    Example:
+      tokenize_messages(["look 👀 https://www.youtube.com/watch?v=x"])["domains"]  # ["youtube.com"]
+    """
+    n = len(messages)
+    text = "\n".join(messages)
+    starts = np.zeros(n + 1, dtype=np.int64)  # position of every message in text
+    starts[1:] = np.cumsum(np.fromiter(map(len, messages), dtype=np.int64, count=n) + 1)
+
+    links = [(match.start(), match.end(), match.group(1)) for match in LINK_PATTERN.finditer(text)]
+    link_spans = np.array([(start, end) for start, end, domain in links], dtype=np.int64).reshape(-1, 2)
+    link_rows = np.searchsorted(starts, link_spans[:, 0], side="right") - 1
+
+    def rows_outside_links(positions):
+        # message of every position, -1 for the mentions and emoji that are part of a link
+        i = np.searchsorted(link_spans[:, 0], positions, side="right") - 1
+        inside = (i >= 0) & (positions < link_spans[np.maximum(i, 0), 1]) if len(links) else np.zeros(len(positions), dtype=bool)
+        return np.where(inside, -1, np.searchsorted(starts, positions, side="right") - 1)
+
+    mention_rows = rows_outside_links(np.fromiter((match.start() for match in MENTION_PATTERN.finditer(text)), dtype=np.int64))
+    faces = [(match.start(), match.group()) for match in EMOJI_PATTERN.finditer(text)]
+    emoji_rows = rows_outside_links(np.array([position for position, face in faces], dtype=np.int64))
+
+    # the links are cut out of the joined text, which is then split into the messages again (a link has no line break)
+    kept = np.concatenate([[0], link_spans.ravel(), [len(text)]]).tolist()
+    texts = "".join([text[start:end] for start, end in zip(kept[::2], kept[1::2])]).split("\n") if n else []
+
+    domains, emoji = [""] * n, [""] * n
+    for row, (start, end, domain) in zip(link_rows.tolist(), links):
+        domain = domain.lower().rstrip(".,;!?)]'\"")
+        domains[row] = domain if not domains[row] else domains[row] + " " + domain
+    for row, (position, face) in zip(emoji_rows.tolist(), faces):
+        if row >= 0:
+            emoji[row] = face if not emoji[row] else emoji[row] + " " + face
+
+    return {"message": texts,
+            "len_message": np.fromiter(map(len, texts), dtype=np.int32, count=n),
+            "n_links": _int16(np.bincount(link_rows, minlength=n)),
+            "n_emoji": _int16(np.bincount(emoji_rows[emoji_rows >= 0], minlength=n)),
+            "n_mentions": _int16(np.bincount(mention_rows[mention_rows >= 0], minlength=n)),
+            "domains": pd.Categorical(domains), "emoji": pd.Categorical(emoji)}
+
+
+class TokenStore:
+    """
+    Lowercase words of the messages (the tokenization of the word cloud, see WORD_PATTERN), tokenized once: the int32 ids
+    of the words of every message one after the other in one flat array, the position of the first word of every
+    message in it and the vocabulary that the ids point to. Word counts, word clouds and top-word tables are bincounts
+    of the ids instead of splitting the messages again
+
+    Example:
+      tokens = TokenStore(df["message"].values)
+      tokens.top_words(10)
+    """
+
+    def __init__(self, messages=()):
+        self.vocabulary = []  # id -> word
+        self._word_ids = {}  # word -> id
+        self.ids = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)  # words of message i: ids[offsets[i]:offsets[i + 1]]
+        if len(messages):
+            self.add(messages)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _vocabulary_ids(self, words):
+        """
+        ids of the words, the new ones are added to the vocabulary
+        """
+        ids = np.empty(len(words), dtype=np.int32)
+        for i, word in enumerate(words):
+            word_id = self._word_ids.get(word)
+            if word_id is None:
+                word_id = self._word_ids[word] = len(self.vocabulary)
+                self.vocabulary.append(word)
+            ids[i] = word_id
+        return ids
+
+    def add(self, messages):
+        """
+        Tokenizes the messages and appends them to the store
+
+        Output:
+          n_words: int32 array of the number of words of every message
+        """
+        if len(messages) == 0:
+            return np.zeros(0, dtype=np.int32)
+        # one regex pass over the batch joined by line breaks (the messages are single lines), a line break ends a message,
+        # and the words are numbered by a hash table over the batch so only its distinct words are looked up
+        tokens = _WORDS_AND_BREAKS.findall("\n".join(messages).lower() + "\n")
+        codes, words = pd.factorize(np.array(tokens, dtype=object))
+        line_break = words.tolist().index("\n")
+        mapping = np.full(len(words), -1, dtype=np.int32)
+        is_word = np.arange(len(words)) != line_break
+        mapping[is_word] = self._vocabulary_ids(words[is_word])
+
+        is_break = codes == line_break
+        ends = np.flatnonzero(is_break) - np.arange(len(messages))  # number of words before the end of every message
+        self.ids = np.concatenate([self.ids, mapping[codes[~is_break]]])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + ends])
+        return np.diff(ends, prepend=0).astype(np.int32)
+
+    def copy(self):
+        """
+        Store of the same messages that can be extended without changing this one
+        """
+        tokens = TokenStore()
+        tokens.vocabulary, tokens._word_ids = list(self.vocabulary), dict(self._word_ids)
+        tokens.ids, tokens.offsets = self.ids, self.offsets  # replaced, never written to, by add and extend
+        return tokens
+
+    def extend(self, other):
+        """
+        Appends the messages of another store, its words are mapped to the ids of this vocabulary
+        """
+        if len(self) == 0 and not self.vocabulary:
+            self.vocabulary, self._word_ids = list(other.vocabulary), dict(other._word_ids)
+            self.ids, self.offsets = other.ids, other.offsets
+            return
+        mapping = self._vocabulary_ids(other.vocabulary)
+        self.ids = np.concatenate([self.ids, mapping[other.ids]])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + other.offsets[1:]])
+
+    def _positions(self, rows):
+        """
+        Positions in ids of the words of the messages of the given rows (a slice or an array of positions)
+        """
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(len(self))
+            if step == 1:
+                return np.arange(self.offsets[start], self.offsets[max(start, stop)])
+            rows = np.arange(start, stop, step)
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def reorder(self, order):
+        """
+        Puts the messages in the given order (eg. the order that sorts the dataframe), the vocabulary stays the same
+        """
+        lengths = np.diff(self.offsets)[order]
+        self.ids = self.ids[self._positions(order)]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    def n_words(self):
+        """
+        Number of words of every message
+        """
+        return np.diff(self.offsets)
+
+    def counts(self, rows=None):
+        """
+        Number of times every word of the vocabulary is written, in all the messages or in the ones of the given rows
+        (a slice or an array of positions), as an array indexed by the word ids
+        """
+        ids = self.ids if rows is None else self.ids[self._positions(rows)]
+        return np.bincount(ids, minlength=len(self.vocabulary))
+
+    def frequencies(self, rows=None):
+        """
+        dict of word -> count of the words written in the messages (see counts), for word_cloud_frequencies
+        """
+        counts = self.counts(rows)
+        used = np.flatnonzero(counts)
+        return dict(zip([self.vocabulary[i] for i in used.tolist()], counts[used].tolist()))
+
+    def top_words(self, n=10, rows=None, stopwords=CLOUD_STOPWORDS):
+        """
+        The n most written words of the messages (see counts) without the stopwords and numbers, like the word cloud
+
+        Output:
+          top: series of word -> count
+        """
+        counts = self.counts(rows)
+        top = []
+        for i in np.argsort(-counts, kind="stable").tolist():
+            if counts[i] == 0 or len(top) == n:
+                break
+            word = self.vocabulary[i]
+            if word not in stopwords and not word.isdigit():
+                top.append(i)
+        return pd.Series(counts[top], index=pd.Index([self.vocabulary[i] for i in top], name="word"), name="count")
+
+    def save(self, path):
+        """
+        Writes the store to a .npz file, read back with TokenStore.load
+        """
+        vocabulary = np.frombuffer("\n".join(self.vocabulary).encode("utf-8"), dtype=np.uint8)
+        with open(path, "wb") as store_file:
+            np.savez(store_file, ids=self.ids, offsets=self.offsets, vocabulary=vocabulary)
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with np.load(path) as data:
+            store.ids, store.offsets = data["ids"], data["offsets"]
+            vocabulary = data["vocabulary"].tobytes().decode("utf-8")
+        store.vocabulary = vocabulary.split("\n") if vocabulary else []
+        store._word_ids = {word: i for i, word in enumerate(store.vocabulary)}
+        return store
+
+
+def _messages_to_df(records, time_format, languages=SYSTEM_MESSAGE_LANGUAGES, tokens=None):
+    """
+    Converts a batch of (date_time, user_msg) records to the preprocessed dataframe,
+    the words of its messages are added to tokens (a TokenStore)
+    """
+    if tokens is None:
+        tokens = TokenStore()
+
+    with instrumentation.stage("split_user", len(records)):
+        df = pd.DataFrame(records, columns=["date_time", "user_msg"])
+
+        # split user and msg: lazy match to the first {user_name}: pattern of each msg, applied to the whole column at once
+        parts = df["user_msg"].str.extract(USER_MSG_PATTERN)
+        # other notifications in the group(eg: someone was added, some left ...) have no {user_name}: part
+        df["user"] = parts[0].fillna("group_notification")
+        df["message"] = parts[1].fillna(df["user_msg"])
+        # dropping the old user_msg column.
+        df.drop("user_msg", axis=1, inplace=True)
+
+    with instrumentation.stage("filter_messages", len(df)) as filtered:
+        # dropping the empty messages, group notifications and system messages ("<Media omitted>", deleted messages ...)
+        # with one mask, before the other columns are computed for them (a message of only a link is kept, so its link counts)
+        df = df[keep_mask(df, languages)].reset_index(drop=True)
+        filtered.rows = len(df)
+
+    with instrumentation.stage("to_datetime", len(df)):
+        # converting date-time pattern which is of type String to type datetime, before the words are added to
+        # tokens so a batch whose dates don't fit the format can be converted again (see parse_records)
+        df["date_time"] = pd.to_datetime(df["date_time"], format=DATETIME_FORMATS[time_format])  # ex. 2022-09-20 22:10:00
+
+    with instrumentation.stage("tokenize", len(df)):
+        # links are removed from the messages while their domains, the emoji and the mentions are counted,
+        # the length (by char) and the words of a message are counted without its links
+        columns = tokenize_messages(df["message"].values)
+        columns["n_words"] = tokens.add(columns["message"])
+        for column in CHAT_SCHEMA:
+            if column in columns:
+                df[column] = columns[column]
+
+    return df
+
+
+def _swap_day_month(df):
+    """
+    df with the day and the month of date_time swapped back, for the batches that were converted with the wrong one
+    of DD/MM and MM/DD (both were at most 12 in them)
+    """
+    dt = df["date_time"]
+    dates = pd.to_datetime(pd.DataFrame({"year": dt.dt.year, "month": dt.dt.day, "day": dt.dt.month}))
+    df["date_time"] = dates + (dt - dt.dt.normalize())
+    return df
+
+
+def add_calendar_columns(df, columns=None):
+    """
+    Adds the time variables derived from date_time to the dataframe (all of CALENDAR_COLUMNS by default)
+
+    Example:
+      add_calendar_columns(df, ["year", "month_t"])
+    """
+    for column in (CALENDAR_COLUMNS if columns is None else columns):
+        if column not in df.columns:
+            df[column] = CALENDAR_COLUMNS[column](df["date_time"])
+    return df
+
+
+class ChatFrame(pd.DataFrame):
+    """
+    Preprocessed chat dataframe that computes the missing time variables of CALENDAR_COLUMNS when they are read,
+    so the ones that a page never reads are never computed. They are returned without being added to the frame,
+    since a parsed chat is shared between sessions (see chat_cache.load_chat) and reading it must not change it;
+    add_calendar_columns adds them to a frame of one's own
+
+    Example:
+      df["month_t"]  # derived from date_time, the frame keeps its columns
+    """
+
+    @property
+    def _constructor(self):
+        return ChatFrame
+
+    def _is_lazy(self, key):
+        return isinstance(key, str) and key in CALENDAR_COLUMNS and key not in self.columns and "date_time" in self.columns
+
+    def _lazy_column(self, key):
+        return CALENDAR_COLUMNS[key](super().__getitem__("date_time")).rename(key)
+
+    def __getitem__(self, key):
+        if self._is_lazy(key):
+            return self._lazy_column(key)
+        if isinstance(key, list) and any(self._is_lazy(column) for column in key):
+            return ChatFrame({column: self[column] for column in key})
+        return super().__getitem__(key)
+
+    def __getattr__(self, name):
+        if self._is_lazy(name):
+            return self._lazy_column(name)
+        return super().__getattr__(name)
+
+    def groupby(self, by=None, *args, **kwargs):
+        # the missing calendar columns are grouped by as series of the same name
+        if self._is_lazy(by):
+            by = self._lazy_column(by)
+        elif isinstance(by, list):
+            by = [self._lazy_column(key) if self._is_lazy(key) else key for key in by]
+        return super().groupby(by, *args, **kwargs)
+
+
+def iter_mapped_records(buffer, time_format):
+    """
+    (date_time, user_msg) record of every message of the raw utf-8 bytes of the export (eg. a mmap of the file).
+    The message boundaries are found by a bytes regex over the whole buffer, and only the messages that can be kept are
+    decoded: group notifications (no "user: " part) and empty messages are skipped as bytes
+
+    Example:
+      with open("groupchat.txt", "rb") as raw_data:
+          records = list(iter_mapped_records(raw_data.read(), "Format1"))
+    """
+    header, header_end = None, None
+    for match in itertools.chain(SPLIT_FORMATS_BYTES[time_format].finditer(buffer), [None]):
+        if header_end is not None:
+            if match is not None:
+                body = buffer[header_end:match.start() - 1]  # up to the line break before the next header
+            else:
+                body = buffer[header_end:]
+                if body.endswith(b"\n"):
+                    body = body[:-1]
+            if b":" in body:
+                if b"\n" in body or b"\r" in body:  # multi-line message, joined like iter_records
+                    body = b" ".join(line.rstrip(b"\r") for line in body.split(b"\n"))
+                yield _clean_header(header.decode("utf-8")), body.decode("utf-8", "replace")
+        if match is not None:
+            header, header_end = match.group(1), match.end()
+
+
+def parse_chat(chat_file, time_format="auto", batch_size=BATCH_SIZE, use_mmap=False, languages=SYSTEM_MESSAGE_LANGUAGES,
+               tokens=None):
+    """
+    Streams the exported chat and builds the preprocessed dataframe in batches of at most batch_size messages,
+    so the memory used grows with the resulting dataframe and not with copies of the whole txt file
+
+    Parameters:
+      chat_file: path, bytes or file-like object of the exported chat (see open_chat)
+      time_format: one of the keys of DATETIME_FORMATS, "auto" to detect it from the first lines (see sniff_format)
+      batch_size: number of messages converted to a dataframe at once
+      use_mmap: for a txt file on disk, memory-map it and parse its bytes (see iter_mapped_records) instead of
+        reading it line by line; the pages of the file are read by the os as needed, which suits very large exports
+      languages: languages of SYSTEM_MESSAGE_RULES whose system messages are dropped
+      tokens: TokenStore that the words of the messages are added to, in the order of the dataframe
+
+    Output:
+      df: preprocessed dataframe
+
+    Example:
+      df = parse_chat("groupchat.txt")
+      df = parse_chat("archive/big_group.txt", use_mmap=True)
+    """
+    if use_mmap and isinstance(chat_file, (str, os.PathLike)) and os.path.getsize(chat_file) > 0 and not is_zip(chat_file):
+        with instrumentation.stage("parse_chat") as parsed, open(chat_file, "rb") as raw_data, \
+                mmap.mmap(raw_data.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if time_format == "auto":
+                detected = sniff_formats(buffer[:SNIFF_SIZE].decode("utf-8", "ignore") + "\n")
+                if not detected:
+                    raise ValueError("The date format of the chat could not be detected")
+                # the formats the sample can't tell apart have the same header, the later headers settle it
+                headers = (match.group(1).decode("utf-8", "ignore")
+                           for match in SPLIT_FORMATS_BYTES[detected[0]].finditer(buffer, SNIFF_SIZE))
+                try:
+                    time_format = settle_format(detected, headers)
+                finally:
+                    headers.close()  # releases the buffer, the mmap can't be closed while it is scanned
+            elif SPLIT_FORMATS_BYTES[time_format].search(buffer, 0, SNIFF_SIZE) is None:  # see resolve_format
+                raise ValueError("No message of the chat starts with a date of the format {}".format(time_format))
+            df = parse_records(iter_mapped_records(buffer, time_format), time_format, batch_size, languages, tokens)
+            parsed.rows = len(df)
+        return df
+
+    with instrumentation.stage("parse_chat") as parsed, open_chat(chat_file) as stream:
+        lines, time_format = resolve_format(stream, time_format)
+        df = parse_records(iter_records(lines, time_format), time_format, batch_size, languages, tokens)
+        parsed.rows = len(df)
+    return df
+
+
+def parse_records(records, time_format, batch_size=BATCH_SIZE, languages=SYSTEM_MESSAGE_LANGUAGES, tokens=None):
+    """
+    Builds the preprocessed dataframe from (date_time, user_msg) records in batches of at most batch_size messages,
+    the messages that are dropped (see keep_mask) are filtered out of each batch.
+    The words of the messages are added to tokens (a TokenStore) if it is given
+
+    Example:
+      df = parse_records(iter_messages("groupchat.txt", "Format1"), "Format1")
+      tokens = TokenStore()
+      df = parse_records(iter_messages("groupchat.txt", "Format1"), "Format1", tokens=tokens)
+    """
+    store = TokenStore()  # the words of these messages, in the order of the batches until they are sorted
+    frames = []
+    while True:
+        # reading, decoding and joining the lines of the next batch of messages
+        with instrumentation.stage("read_records") as read:
+            batch = list(itertools.islice(records, batch_size))
+            read.rows = len(batch)
+        if not batch:
+            break
+        try:
+            frames.append(_messages_to_df(batch, time_format, languages, store))
+        except ValueError:
+            # a date that doesn't fit the format, eg. an MM/DD export whose first lines only had days up to 12:
+            # the batches so far are converted again with the day and month swapped (see swapped_format)
+            swapped = swapped_format(time_format)
+            if swapped is None:
+                raise
+            frames.append(_messages_to_df(batch, swapped, languages, store))
+            frames[:-1] = [_swap_day_month(frame) for frame in frames[:-1]]
+            time_format = swapped
+    if not frames:  # no message could be found with the given time format
+        frames.append(_messages_to_df([], time_format, languages, store))
+
+    with instrumentation.stage("concat", sum(len(frame) for frame in frames)):
+        df = ChatFrame(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+
+    with instrumentation.stage("sort", len(df)):
+        # the messages are exported in order, except when the clock of a phone was changed (see RangeTotals)
+        if not df["date_time"].is_monotonic_increasing:
+            order = np.argsort(df["date_time"].values, kind="stable")
+            df = ChatFrame(df.take(order).reset_index(drop=True))
+            store.reorder(order)
+    if tokens is not None:
+        tokens.extend(store)
+
+    with instrumentation.stage("calendar_columns", len(df)):
+        # generating the time variables used by every page, the others are derived on first access
+        add_calendar_columns(df, ["date", "day_t", "hour"])
+
+        # compact dtypes of the parsed chat schema (see CHAT_SCHEMA), the categories of the batches differ
+        for column in ["user", "domains", "emoji"]:
+            df[column] = df[column].astype("category")
+
+    return df
+
+
+def append_chat(df, new_df):
+    """
+    Dataframe of the chat with the messages of new_df (eg. the new tail of a re-exported chat) appended,
+    with the columns and compact dtypes of df
+
+    Example:
+      df = append_chat(df, parse_records(new_records, "Format1"))
+    """
+    add_calendar_columns(new_df, [column for column in df.columns if column in CALENDAR_COLUMNS])
+    users = pd.api.types.union_categoricals([df["user"], new_df["user"]], sort_categories=True)
+    df = ChatFrame(pd.concat([df, new_df[list(df.columns)]], ignore_index=True))
+    df["user"] = users
+    for column in ["domains", "emoji"]:
+        df[column] = df[column].astype("category")
+    if not df["date_time"].is_monotonic_increasing:  # kept sorted by date_time like parse_records
+        df = ChatFrame(df.sort_values("date_time", kind="stable", ignore_index=True))
+    return df
+
+
+def txtToDf(chat_file, time_format="auto"):
     """
     Converting the txt file that exported from WhatsApp to pandas dataframe
 
     Parameters:
       chat_file: the group chat that has been exported and will be analyzed.
-      time_format: the time format of the export that changes according to the phone language and model. This code contains 2 formats.
+      time_format: the time format of the export that changes according to the phone language and model.
+        "auto" detects it from the first lines, the known formats are in DATETIME_FORMATS, eg.
         * Format1: DD.MM.YYYY HH:MM
         * Format2: DD/MM/YYYY, HH:MM
+        * Format3: [DD.MM.YYYY HH:MM:SS]
 
     Output:
       df: preprocessed dataframe
@@ -30,77 +1010,19 @@ def txtToDf(chat_file, time_format):
     Example:
       df = txtToDf("groupchat.txt", "Format1")
     """
+    return parse_chat(chat_file, time_format)
 
-    # Depending on date format of exported txt file
-    split_formats = {
-        "Format1": "\d{1,2}.\d{1,2}.\d{2,4}\s\d{1,2}:\d{2}\s-\s",  # DD.MM.YYYY HH:MM
-        "Format2": "\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s"  # DD/MM/YYYY, HH:MM
-    }
-
-    with open(chat_file, "r", encoding="utf-8") as raw_data:
-        raw_string = " ".join(raw_data.read().split(
-            "\n"))  # converting the list split by newline char. as one whole string as there can be multi-line messages
-        user_msg = re.split(split_formats[time_format], raw_string)[
-                   1:]  # splits at all the date-time pattern, resulting in list of all the messages with user names
-        date_time = re.findall(split_formats[time_format], raw_string)  # finds all the date-time patterns
-
-        df = pd.DataFrame({"date_time": date_time, "user_msg": user_msg})  # exporting it to a df
-
-    # split user and msg
-    usernames = []
-    messages = []
-    for i in df["user_msg"]:
-        a = re.split("([\w\W]+?):\s",
-                     i)  # lazy pattern match to first {user_name}: pattern and spliting it aka each msg from a user
-        if (a[1:]):  # user typed messages
-            usernames.append(a[1])
-            messages.append(a[2])
-        else:  # other notifications in the group(eg: someone was added, some left ...)
-            usernames.append("group_notification")
-            messages.append(a[0])
-
-    # creating new columns
-    df["user"] = usernames
-    df["message"] = messages
-
-    # replace links
-    df['message'] = df['message'].replace(r'http\S+', '', regex=True).replace(r'www\S+', '', regex=True)
-    df["len_message"] = df["message"].str.len()  # length of messages (by char)
-    df["n_words"] = df["message"].str.split().str.len()  # number of words in a message
-
-    # format for converting date_time variable to type datetime
-    datetime_format = "%d.%m.%Y %H:%M - "
-
-    # converting date-time pattern which is of type String to type datetime
-    df["date_time"] = pd.to_datetime(df["date_time"], format=datetime_format)  # ex. 2022-09-20 22:10:00
-
-    # generating new time variables
-    df["date"] = df["date_time"].apply(lambda x: x.date())  # ex. 2022-09-20
-    df["year"] = df["date_time"].dt.year  # ex. 2022
-    df['month_n'] = df['date_time'].dt.month  # month_numeric ex. 8
-    df["month_t"] = df["date_time"].dt.strftime("%b")  # month_text ex. Mar
-    df["day_n"] = df["date_time"].dt.day  # day_numeric ex. 14
-    df["day_of_week"] = df["date_time"].dt.weekday + 1  # for Mon: 1 - Sun: 7 (org. Mon: 0 - Sun: 6)
-    df["day_t"] = df["date_time"].dt.strftime("%a")  # day_text, ex. Tue
-    df["time"] = df["date_time"].apply(lambda x: x.time())  # ex. 22:10:00
-    df["hour"] = df["date_time"].apply(lambda x: x.hour)  # ex. 22
-    df['minute'] = df['date_time'].dt.minute  # ex. 08
-
-    # dropping the old user_msg column.
-    df.drop("user_msg", axis=1, inplace=True)
-    # dropping the empty messages
-    df = df[df['message'] != ""].reset_index(drop=True)
-    # dropping "medya dahil edilmedi" messages
-    df = df[df["message"] != "<medya dahil edilmedi>"].reset_index(drop=True)
-    df = df[df["message"] != "<Medya dahil edilmedi>"].reset_index(drop=True)
-
-    # dropping group_notification messages
-    df = df[df['user'] != "group_notification"].reset_index(drop=True)
-
-    # adding extra helper column --> message_count
-    df['message_count'] = [1] * df.shape[0]
 
-    return df
+def count_days(first, last):
+    """
+    Number of days from the day of first to the day of last, both included: the n_days of the general statistics
+    of the whole chat (df_general_stats) and of a date range (RangeTotals.stats)
+
+    Example:
+      count_days("2022-09-20 22:10", "2022-09-21 08:00")  # 2
+    """
+    return (pd.Timestamp(last).normalize() - pd.Timestamp(first).normalize()).days + 1
+
 
 def df_general_stats(df, show_print=False):
     """
@@ -119,8 +1041,8 @@ def df_general_stats(df, show_print=False):
     # user_list = sorted(df["user"].unique().tolist())
     # total number of messages
     n_messages = len(df["message"])
-    # number of days since the group was created
-    n_days = (datetime.datetime.utcnow() - df.date_time.min()).days
+    # number of days from the first to the last message (see count_days)
+    n_days = count_days(df.date_time.min(), df.date_time.max())
     # average message per day
     avg_message_per_day = n_messages / n_days
     # average number of messages per user
@@ -130,7 +1052,7 @@ def df_general_stats(df, show_print=False):
     min_len_message = df["len_message"].min()
     avg_len_message = df["len_message"].mean()
     user_max_len_message = df[df["len_message"] == max_len_message][
-        "user"].item()  # the person who wrote the longest message of the group
+        "user"].iat[0]  # the person who wrote the longest message of the group (the first one if several did)
     # max-min-mean length of messages (by word)
     n_words = df["n_words"].sum()
     max_word_message = df["n_words"].max()
@@ -141,7 +1063,7 @@ def df_general_stats(df, show_print=False):
     if show_print == True:
         print("number of users:", n_users)
         print("number of messages:", n_messages)
-        print("number of days since the group was created:", n_days)
+        print("number of days from the first to the last message:", n_days)
         print("average message per day:", avg_message_per_day)
         print("average message per user:", avg_message_per_user)
         print("maximum char length of messages:", max_len_message)
@@ -156,15 +1078,828 @@ def df_general_stats(df, show_print=False):
     # variable list: n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words
     return n_users, n_messages, n_days, avg_message_per_day, avg_message_per_user, max_len_message, min_len_message, avg_len_message, user_max_len_message, n_words, max_word_message, min_word_message, avg_words
 
-def daily_conversation_graph(df):
+def memory_usage_report(df, n_messages=5000000, show_print=False):
+    """
+    Memory used by each column of the parsed chat and its linear estimate for a chat with n_messages messages
+
+    Parameters:
+        df: preprocessed group chat dataframe
+        n_messages: number of messages of the chat that will be estimated
+        show_print: if you want to see the report in MB
+
+    Output:
+        report: dataframe of dtype, bytes, bytes_per_message and estimated_bytes per column (+ index and total rows)
+
+    Example:
+        report = memory_usage_report(df, n_messages=5000000)
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str).reindex(usage.index, fill_value=""), "bytes": usage})
+    report.loc["total"] = ["", usage.sum()]
+    report["bytes_per_message"] = report["bytes"] / max(len(df), 1)
+    report["estimated_bytes"] = (report["bytes_per_message"] * n_messages).round().astype("int64")
+
+    # if you want the print
+    if show_print == True:
+        print("number of messages:", len(df))
+        print("memory usage (MB):", round(usage.sum() / 2 ** 20, 2))
+        print("estimated memory usage for", n_messages, "messages (MB):", round(report.loc["total", "estimated_bytes"] / 2 ** 20, 2))
+
+    return report
+
+def activity_cube(df):
+    """
+    Number of messages of every user x date x hour cell (with the weekday of the date), built in one pass.
+    Hour, weekday, day and user counts of the group or of one user are cheap reductions of it (see cube_counts)
+
+    Output:
+      cube: dataframe of user, date, hour, day_t and message_count, only for the cells that have messages
+
+    Example:
+      cube = activity_cube(df)
+    """
+    cube = df.groupby(["user", "date", "hour"], observed=True, sort=True).size().reset_index(name="message_count")
+    cube["message_count"] = cube["message_count"].astype("int32")
+    cube["day_t"] = CALENDAR_COLUMNS["day_t"](cube["date"])
+    return cube
+
+
+def cube_counts(cube, by, user=None):
+    """
+    Number of messages grouped by the given column(s) of the activity cube, for the whole group or one user
+
+    Example:
+      cube_counts(cube, "hour", user="6udcaAqLvO")
+    """
+    if user is not None:
+        cube = cube[cube["user"] == user]
+    return cube.groupby(by, observed=True)["message_count"].sum()
+
+
+def cube_hour_counts(cube, user=None):
     """
-    Create a line plot about number of messages based days
+    most messaged hours, for all 24 hours
     """
+    return cube_counts(cube, "hour", user).reindex(range(24), fill_value=0).rename_axis("hour")
+
 
-    df1 = df.copy()
+def cube_weekday_counts(cube, user=None):
+    """
+    most messaged weekdays, from Mon to Sun
+    """
+    return cube_counts(cube, "day_t", user).reindex(DAY_NAMES, fill_value=0).rename_axis("day_t")
 
-    # grouping by date; since plot is of frequency of messages --> no. of messages / day.
-    df1 = df1.groupby('date').sum().reset_index()
+
+def cube_day_hour(cube, user=None):
+    """
+    day x hour activity table for the heatmap
+    """
+    return cube_counts(cube, ["day_t", "hour"], user).unstack(fill_value=0).reindex(index=DAY_NAMES, columns=range(24), fill_value=0)
+
+
+def cube_daily_counts(cube, user=None):
+    """
+    number of messages per day, for the conversation history plot
+    """
+    return cube_counts(cube, "date", user)
+
+
+def cube_top_n_days(cube, n=10, user=None):
+    """
+    most messaged days table
+    """
+    return cube_daily_counts(cube, user).sort_values(ascending=False, kind="stable").head(n).reset_index()
+
+
+def cube_top_n_user(cube, n=10):
+    """
+    most messaged users table
+    """
+    return cube_counts(cube, "user").sort_values(ascending=False, kind="stable").head(n).reset_index()
+
+
+def history_pyramid(daily):
+    """
+    Number of messages per day, week and month, so the history plot can switch between them without going back
+    to the messages. Days without messages are counted as 0 and the weeks start on Monday
+
+    Parameters:
+      daily: number of messages per day (see cube_daily_counts)
+
+    Output:
+      pyramid: dict of HISTORY_LEVELS -> series indexed by the first day of each day, week or month
+
+    Example:
+      pyramid = history_pyramid(cube_daily_counts(cube))
+      pyramid[history_level(pyramid)]
+    """
+    if daily.empty:
+        return {level: daily for level in HISTORY_LEVELS}
+    days = pd.date_range(daily.index.min(), daily.index.max(), freq="D", name="date")
+    day = daily.reindex(days, fill_value=0)
+    return {level: day if frequency == "D" else day.resample(frequency, label="left", closed="left").sum()
+            for level, frequency in HISTORY_LEVELS.items()}
+
+
+def history_range(pyramid, level, start=None, end=None):
+    """
+    The counts of one level of the pyramid for the days, weeks or months that overlap [start, end] (dates, both included)
+    """
+    series = pyramid[level]
+    if start is not None:
+        series = series[series.index + pd.tseries.frequencies.to_offset(HISTORY_LEVELS[level]) > pd.Timestamp(start)]
+    if end is not None:
+        series = series[series.index <= pd.Timestamp(end)]
+    return series
+
+
+def history_level(pyramid, max_points=HISTORY_MAX_POINTS, start=None, end=None):
+    """
+    The finest level of the pyramid with at most max_points points between start and end
+    (the coarsest one if none of them is that short)
+    """
+    for level in HISTORY_LEVELS:
+        if len(history_range(pyramid, level, start, end)) <= max_points:
+            return level
+    return level
+
+
+def user_index(df):
+    """
+    Row positions of the messages of every user, built with one stable sort of the user codes
+
+    Output:
+      index: dict of user -> numpy array of row positions (in chat order)
+
+    Example:
+      user_df = df.iloc[user_index(df)["6udcaAqLvO"]]
+    """
+    codes = df["user"].cat.codes.values
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(df["user"].cat.categories))
+    return dict(zip(df["user"].cat.categories, np.split(order, np.cumsum(counts)[:-1])))
+
+
+def user_stats_table(df):
+    """
+    Statistics of every user computed in one grouped aggregation: number of messages and words,
+    min-max-mean length of messages (by char and by word) and the row position of the longest message
+
+    Example:
+      user_stats_table(df).loc["6udcaAqLvO", "n_messages"]
+    """
+    stats = df.groupby("user", observed=True, sort=True).agg(
+        n_messages=("len_message", "size"),
+        n_words=("n_words", "sum"),
+        min_len_message=("len_message", "min"),
+        max_len_message=("len_message", "max"),
+        avg_len_message=("len_message", "mean"),
+        min_word_message=("n_words", "min"),
+        max_word_message=("n_words", "max"),
+        avg_words=("n_words", "mean"),
+        longest_message=("len_message", "idxmax"),
+    )
+    stats.index = stats.index.astype(str)
+    return stats
+
+
+def token_counts(df, column="domains"):
+    """
+    Number of times every user wrote every link domain (column="domains") or emoji (column="emoji"), from the tokens
+    that tokenize_messages kept for every message, so the messages are not scanned again.
+    Only the distinct (user, tokens) pairs are split, not every message
+
+    Output:
+      counts: dataframe of user, token and count, the most frequent first
+
+    Example:
+      counts = token_counts(df, "emoji")
+      top_tokens(counts, 10)
+    """
+    pairs = df.groupby(["user", column], observed=True, sort=False).size()
+    rows = [(user, token, count) for (user, tokens), count in pairs.items() if tokens for token in tokens.split(" ")]
+    counts = pd.DataFrame(rows, columns=["user", "token", "count"]).astype({"user": str, "token": str, "count": "int64"})
+    counts = counts.groupby(["user", "token"], sort=False, as_index=False)["count"].sum()
+    return counts.sort_values(["count", "user", "token"], ascending=[False, True, True], ignore_index=True)
+
+
+def top_tokens(counts, n=10, user=None):
+    """
+    The n most frequent tokens of token_counts, of the whole group or of one user
+
+    Example:
+      top_tokens(token_counts(df, "domains"), 5)
+    """
+    if user is not None:
+        counts = counts[counts["user"] == user]
+    return counts.groupby("token")["count"].sum().sort_values(ascending=False, kind="stable").head(n)
+
+
+def _first_max_positions(values, starts):
+    """
+    Maximum of every segment of values (segments start at starts) and the position of its first row
+    """
+    maxima = np.maximum.reduceat(values, starts)
+    segments = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    positions = np.flatnonzero(values == maxima[segments])
+    return maxima, positions[np.unique(segments[positions], return_index=True)[1]]
+
+
+class RangeTotals:
+    """
+    Message, word and character counts of the chat and of every user over any range of dates, from cumulative counts
+    per day (and per user and day): a range is answered by binary searches and subtractions instead of a pass over
+    the messages. The min-max lengths are reductions of the daily values of the range. Needs the chat sorted by date_time
+
+    Example:
+      totals = RangeTotals(df)
+      totals.stats("2022-01-01", "2022-06-30")["n_messages"]
+    """
+
+    def __init__(self, df):
+        n = len(df)
+        day_of_row = df["date_time"].values.astype("datetime64[D]")
+        self.days, day_starts = np.unique(day_of_row, return_index=True)  # first row of every day
+        n_per_day = np.diff(np.append(day_starts, n))
+        len_message = df["len_message"].values.astype("int64")
+        n_words = df["n_words"].values.astype("int64")
+        self.users = df["user"].cat.categories.astype(str)
+        self.user_codes = df["user"].cat.codes.values
+
+        # per day, for the group
+        self.cum_messages = np.concatenate([[0], np.cumsum(n_per_day)])
+        self.cum_words = np.concatenate([[0], np.cumsum(np.add.reduceat(n_words, day_starts) if n else [])])
+        self.cum_chars = np.concatenate([[0], np.cumsum(np.add.reduceat(len_message, day_starts) if n else [])])
+        if n:
+            self.max_len, self.longest = _first_max_positions(len_message, day_starts)
+            self.min_len = np.minimum.reduceat(len_message, day_starts)
+            self.max_words = np.maximum.reduceat(n_words, day_starts)
+            self.min_words = np.minimum.reduceat(n_words, day_starts)
+
+        # per user and day: the cells are sorted by user code, then day, so the days of a user are contiguous
+        day_index = np.repeat(np.arange(len(self.days)), n_per_day)
+        keys = df["user"].cat.codes.values.astype("int64") * len(self.days) + day_index
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        cell_starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if n else np.array([], dtype=np.int64)
+        self.cell_keys = keys[cell_starts]
+        self.cell_cum_messages = np.concatenate([[0], np.cumsum(np.diff(np.append(cell_starts, n)))])
+        self.cell_cum_words = np.concatenate([[0], np.cumsum(np.add.reduceat(n_words[order], cell_starts) if n else [])])
+        self.cell_cum_chars = np.concatenate([[0], np.cumsum(np.add.reduceat(len_message[order], cell_starts) if n else [])])
+        if n:
+            self.cell_max_len, cell_longest = _first_max_positions(len_message[order], cell_starts)
+            self.cell_longest = order[cell_longest]  # row of the longest message of every cell
+            self.cell_min_len = np.minimum.reduceat(len_message[order], cell_starts)
+            self.cell_max_words = np.maximum.reduceat(n_words[order], cell_starts)
+            self.cell_min_words = np.minimum.reduceat(n_words[order], cell_starts)
+
+        # the links, emoji and mentions per day and per user and day (see tokenize_messages)
+        self.cum_tokens, self.cell_cum_tokens = {}, {}
+        for column in TOKEN_COUNTS:
+            values = df[column].values.astype("int64")
+            self.cum_tokens[column] = np.concatenate([[0], np.cumsum(np.add.reduceat(values, day_starts) if n else [])])
+            self.cell_cum_tokens[column] = np.concatenate([[0], np.cumsum(np.add.reduceat(values[order], cell_starts) if n else [])])
+
+    def day_range(self, start=None, end=None):
+        """
+        Positions [i, j) of the days between start and end (both included) in self.days
+        """
+        i = 0 if start is None else np.searchsorted(self.days, np.datetime64(pd.Timestamp(start).date(), "D"), "left")
+        j = len(self.days) if end is None else np.searchsorted(self.days, np.datetime64(pd.Timestamp(end).date(), "D"), "right")
+        return i, max(i, j)
+
+    def _user_cells(self, i, j):
+        # cells [lo, hi) of every user code in the day range [i, j)
+        firsts = np.arange(len(self.users), dtype=np.int64) * len(self.days)
+        return np.searchsorted(self.cell_keys, firsts + i), np.searchsorted(self.cell_keys, firsts + j)
+
+    def daily_counts(self, start=None, end=None, user=None):
+        """
+        Number of messages of every day that has messages between start and end, of the group or of one user
+        """
+        i, j = self.day_range(start, end)
+        if user is None:
+            counts, days = np.diff(self.cum_messages[i:j + 1]), self.days[i:j]
+        else:
+            code = self.users.get_loc(user)
+            lo, hi = np.searchsorted(self.cell_keys, [code * len(self.days) + i, code * len(self.days) + j])
+            counts, days = np.diff(self.cell_cum_messages[lo:hi + 1]), self.days[self.cell_keys[lo:hi] - code * len(self.days)]
+        return pd.Series(counts, index=pd.DatetimeIndex(days.astype("datetime64[ns]"), name="date"), name="message_count")
+
+    def token_totals(self, start=None, end=None, user=None):
+        """
+        Number of links, emoji and mentions (TOKEN_COUNTS) between start and end, of the group or of one user, as a dict
+        """
+        i, j = self.day_range(start, end)
+        if user is None:
+            return {column: int(cum[j] - cum[i]) for column, cum in self.cum_tokens.items()}
+        code = self.users.get_loc(user)
+        lo, hi = np.searchsorted(self.cell_keys, [code * len(self.days) + i, code * len(self.days) + j])
+        return {column: int(cum[hi] - cum[lo]) for column, cum in self.cell_cum_tokens.items()}
+
+    def token_table(self, start=None, end=None):
+        """
+        Number of links, emoji and mentions (TOKEN_COUNTS) of every user who wrote between start and end
+        """
+        lo, hi = self._user_cells(*self.day_range(start, end))
+        active = np.flatnonzero(hi > lo)
+        lo, hi = lo[active], hi[active]
+        return pd.DataFrame({column: cum[hi] - cum[lo] for column, cum in self.cell_cum_tokens.items()},
+                            index=pd.Index(self.users[active], name="user"))
+
+    def top_n_days(self, n=10, start=None, end=None, user=None):
+        """
+        most messaged days table of the date range (see cube_top_n_days)
+        """
+        return self.daily_counts(start, end, user).sort_values(ascending=False, kind="stable").head(n).reset_index()
+
+    def top_n_user(self, n=10, start=None, end=None):
+        """
+        most messaged users table of the date range (see cube_top_n_user)
+        """
+        counts = self.user_table(start, end)["n_messages"].rename("message_count")
+        return counts.sort_values(ascending=False, kind="stable").head(n).reset_index()
+
+    def user_table(self, start=None, end=None):
+        """
+        user_stats_table of the messages between start and end (dates, both included), only of the users who wrote then
+        """
+        lo, hi = self._user_cells(*self.day_range(start, end))
+        active = np.flatnonzero(hi > lo)
+        lo, hi = lo[active], hi[active]
+        n_messages = self.cell_cum_messages[hi] - self.cell_cum_messages[lo]
+        n_words = self.cell_cum_words[hi] - self.cell_cum_words[lo]
+        n_chars = self.cell_cum_chars[hi] - self.cell_cum_chars[lo]
+        table = pd.DataFrame({"n_messages": n_messages, "n_words": n_words}, index=pd.Index(self.users[active], name="user"))
+        if len(active):
+            # reductions over the cells [lo, hi) of every active user, a sentinel keeps the last index in bounds
+            bounds = np.ravel(np.column_stack([lo, hi]))
+
+            def reduce_cells(ufunc, values):
+                return ufunc.reduceat(np.append(values, values[-1]), bounds)[::2]
+
+            max_len = reduce_cells(np.maximum, self.cell_max_len)
+            table["min_len_message"] = reduce_cells(np.minimum, self.cell_min_len)
+            table["max_len_message"] = max_len
+            table["avg_len_message"] = n_chars / n_messages
+            table["min_word_message"] = reduce_cells(np.minimum, self.cell_min_words)
+            table["max_word_message"] = reduce_cells(np.maximum, self.cell_max_words)
+            table["avg_words"] = n_words / n_messages
+            table["longest_message"] = [self.cell_longest[a + np.argmax(self.cell_max_len[a:b])] for a, b in zip(lo, hi)]
+        else:
+            for column in ["min_len_message", "max_len_message", "avg_len_message", "min_word_message",
+                           "max_word_message", "avg_words", "longest_message"]:
+                table[column] = pd.Series(dtype="float64")
+        return table
+
+    def stats(self, start=None, end=None):
+        """
+        df_general_stats of the messages between start and end (dates, both included) as a dict of GENERAL_STATS,
+        with the number of days of the range as n_days and the row position of the longest message as longest_message
+        (None if there is no message in the range)
+        """
+        i, j = self.day_range(start, end)
+        n_messages = self.cum_messages[j] - self.cum_messages[i]
+        if n_messages == 0:
+            return None
+        n_words = self.cum_words[j] - self.cum_words[i]
+        n_chars = self.cum_chars[j] - self.cum_chars[i]
+        lo, hi = self._user_cells(i, j)
+        n_days = count_days(self.days[i] if start is None else start, self.days[j - 1] if end is None else end)
+        n_users = int(np.count_nonzero(hi > lo))
+        longest_day = i + int(np.argmax(self.max_len[i:j]))
+        return {
+            "n_users": n_users,
+            "n_messages": int(n_messages),
+            "n_days": n_days,
+            "avg_message_per_day": n_messages / n_days,
+            "avg_message_per_user": n_messages / n_users,
+            "max_len_message": int(self.max_len[longest_day]),
+            "min_len_message": int(self.min_len[i:j].min()),
+            "avg_len_message": n_chars / n_messages,
+            "user_max_len_message": self.users[self.user_codes[self.longest[longest_day]]],
+            "n_words": int(n_words),
+            "max_word_message": int(self.max_words[i:j].max()),
+            "min_word_message": int(self.min_words[i:j].min()),
+            "avg_words": n_words / n_messages,
+            "longest_message": int(self.longest[longest_day]),
+        }
+
+
+def conversation_sessions(df, gap=SESSION_GAP):
+    """
+    Splits the chat into conversations: a conversation ends when nobody writes for longer than gap.
+    Computed on the datetime64 column and its shifted copy, without a loop over the messages.
+    Needs the chat sorted by date_time
+
+    Parameters:
+      df: preprocessed group chat dataframe
+      gap: longest silence inside a conversation, a pandas Timedelta
+
+    Output:
+      sessions: dataframe of the start, end, duration, n_messages, n_users and starter (user of the first message)
+        of every conversation
+      users: dataframe of every user (index) with n_started (conversations started), n_replies (messages written
+        right after another user's message in the same conversation), median_reply and mean_reply (time until
+        those replies)
+
+    Example:
+      sessions, users = conversation_sessions(df, pd.Timedelta(minutes=30))
+    """
+    times = df["date_time"].values
+    codes = df["user"].cat.codes.values.astype("int64")
+    user_names = df["user"].cat.categories.astype(str)
+    n = len(times)
+
+    waits = times[1:] - times[:-1]  # time since the previous message
+    new_session = np.concatenate([[True], waits > np.timedelta64(gap)]) if n else np.array([], dtype=bool)
+    session_of_row = np.cumsum(new_session) - 1
+    starts = np.flatnonzero(new_session)
+    ends = np.append(starts[1:], n)[:len(starts)] - 1
+
+    # distinct users of every session: the distinct (session, user) pairs counted per session
+    pairs = np.unique(session_of_row * len(user_names) + codes)
+    sessions = pd.DataFrame({
+        "start": times[starts],
+        "end": times[ends],
+        "n_messages": ends - starts + 1,
+        "n_users": np.bincount(pairs // max(len(user_names), 1), minlength=len(starts)),
+        "starter": pd.Categorical.from_codes(codes[starts], categories=user_names),
+    })
+    sessions.insert(2, "duration", sessions["end"] - sessions["start"])
+
+    # a reply is a message of another user than the previous message of the same session
+    is_reply = ~new_session[1:] & (codes[1:] != codes[:-1])
+    replies = pd.Series(waits[is_reply], index=codes[1:][is_reply])
+    reply_stats = replies.groupby(level=0).agg(["size", "median", "mean"])
+    users = pd.DataFrame({"n_started": np.bincount(codes[starts], minlength=len(user_names))},
+                         index=pd.Index(user_names, name="user"))
+    users["n_replies"] = reply_stats["size"].reindex(range(len(user_names)), fill_value=0).values
+    users["median_reply"] = reply_stats["median"].reindex(range(len(user_names))).values
+    users["mean_reply"] = reply_stats["mean"].reindex(range(len(user_names))).values
+    return sessions, users.iloc[np.unique(codes)]  # only the users who wrote in df
+
+
+class ReplyGraph:
+    """
+    Who replies to whom: matrix[b, a] is the number of times user b wrote right after user a within window,
+    indexed by the codes of the user column. Built from the user and date_time columns in one vectorized pass.
+    Needs the chat sorted by date_time
+
+    Example:
+      graph = ReplyGraph(df, pd.Timedelta(minutes=5))
+      graph.top_pairs(10)
+    """
+
+    def __init__(self, df, window=REPLY_WINDOW):
+        codes = df["user"].cat.codes.values.astype("int64")
+        times = df["date_time"].values
+        self.users = df["user"].cat.categories.astype(str)
+        n_users = len(self.users)
+
+        is_reply = (codes[1:] != codes[:-1]) & (times[1:] - times[:-1] <= np.timedelta64(window))
+        pairs = codes[1:][is_reply] * n_users + codes[:-1][is_reply]
+        self.matrix = np.bincount(pairs, minlength=n_users * n_users).astype("int32").reshape(n_users, n_users)
+
+    def table(self, users=None):
+        """
+        The matrix as a dataframe of repliers (rows) x replied users (columns), only of the given users if any
+        """
+        table = pd.DataFrame(self.matrix, index=pd.Index(self.users, name="user"), columns=self.users)
+        return table if users is None else table.loc[users, users]
+
+    def top_pairs(self, n=10):
+        """
+        The n pairs with the most replies, as a dataframe of user, replied_to and n_replies
+        """
+        flat = self.matrix.ravel()
+        top = np.argsort(-flat, kind="stable")[:n]
+        top = top[flat[top] > 0]
+        n_users = len(self.users)
+        return pd.DataFrame({"user": self.users[top // n_users], "replied_to": self.users[top % n_users],
+                             "n_replies": flat[top]})
+
+    def degrees(self):
+        """
+        Replies written (out_degree) and received (in_degree) by every user, and the number of users each one replied
+        to (n_replied) and was replied by (n_repliers)
+        """
+        return pd.DataFrame({"out_degree": self.matrix.sum(axis=1), "in_degree": self.matrix.sum(axis=0),
+                             "n_replied": np.count_nonzero(self.matrix, axis=1),
+                             "n_repliers": np.count_nonzero(self.matrix, axis=0)},
+                            index=pd.Index(self.users, name="user"))
+
+
+class ParsedChat:
+    """
+    Parsed chat dataframe together with the tables derived from it, each built once on first use and then reused
+
+    Example:
+      chat = ParsedChat(txtToDf("groupchat.txt", "Format1"))
+      cube_hour_counts(chat.cube)
+    """
+
+    def __init__(self, df, key=None, tokens=None):
+        self.df = df
+        self.key = key  # content hash of the exported chat, if known
+        if tokens is not None:  # the TokenStore filled while parsing, otherwise built from the messages on first use
+            self.tokens = tokens
+        self._histories = {}  # user (None for the group) -> history_pyramid
+        self._sessions = {}  # gap -> conversation_sessions
+        self._reply_graphs = {}  # window -> ReplyGraph
+        self._token_counts = {}  # column -> token_counts
+
+    @functools.cached_property
+    def cube(self):
+        with instrumentation.stage("activity_cube", len(self.df)):
+            return activity_cube(self.df)
+
+    @functools.cached_property
+    def user_index(self):
+        with instrumentation.stage("user_index", len(self.df)):
+            return user_index(self.df)
+
+    @functools.cached_property
+    def user_stats(self):
+        with instrumentation.stage("user_stats", len(self.df)):
+            return user_stats_table(self.df)
+
+    @functools.cached_property
+    def range_totals(self):
+        with instrumentation.stage("range_totals", len(self.df)):
+            return RangeTotals(self.df)
+
+    def period_stats(self, start=None, end=None):
+        """
+        df_general_stats of the messages between start and end (dates, both included), see RangeTotals.stats
+        """
+        return self.range_totals.stats(start, end)
+
+    def period_user_stats(self, start=None, end=None):
+        """
+        user_stats of the messages between start and end (dates, both included), see RangeTotals.user_table
+        """
+        return self.range_totals.user_table(start, end)
+
+    def period_cube(self, start=None, end=None):
+        """
+        The cells of the activity cube between start and end (dates, both included)
+        """
+        dates = self.cube["date"]
+        keep = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            keep &= (dates >= pd.Timestamp(start)).values
+        if end is not None:
+            keep &= (dates <= pd.Timestamp(end)).values
+        return self.cube[keep]
+
+    @functools.cached_property
+    def tokens(self):
+        with instrumentation.stage("token_store", len(self.df)):
+            return TokenStore(self.df["message"].values)
+
+    def message_rows(self, user=None, start=None, end=None):
+        """
+        Rows of the messages of the group or of one user between start and end (dates, both included, None for the
+        whole chat), a slice for the group and an array of positions for a user
+        """
+        i, j = 0, len(self.df)
+        if start is not None or end is not None:
+            days = self.range_totals.day_range(start, end)
+            i, j = int(self.range_totals.cum_messages[days[0]]), int(self.range_totals.cum_messages[days[1]])
+        if user is None:
+            return slice(i, j)
+        positions = self.user_index.get(user, np.array([], dtype=np.int64))
+        return positions[np.searchsorted(positions, i):np.searchsorted(positions, j)]
+
+    def period_word_frequencies(self, start=None, end=None, user=None):
+        """
+        dict of word -> count of the words of the group or of one user between start and end (dates, both included),
+        counted from the token store
+        """
+        return self.tokens.frequencies(self.message_rows(user, start, end))
+
+    def top_words(self, n=10, user=None, start=None, end=None, stopwords=CLOUD_STOPWORDS):
+        """
+        The n most written words of the group or of one user between start and end (see TokenStore.top_words)
+        """
+        return self.tokens.top_words(n, self.message_rows(user, start, end), stopwords)
+
+    def history(self, user=None):
+        """
+        Day, week and month message counts of the group or of one user (see history_pyramid), built once from the cube
+        """
+        if user not in self._histories:
+            with instrumentation.stage("history_pyramid", len(self.cube)):
+                self._histories[user] = history_pyramid(cube_daily_counts(self.cube, user))
+        return self._histories[user]
+
+    def sessions(self, gap=SESSION_GAP, start=None, end=None):
+        """
+        conversation_sessions of the chat, or of the messages between start and end (dates, both included).
+        The sessions of the whole chat are kept for every gap, the ones of a date range are computed from its rows
+        """
+        if start is not None or end is not None:
+            return conversation_sessions(self.period_rows(start, end), gap)
+        if gap not in self._sessions:
+            with instrumentation.stage("conversation_sessions", len(self.df)):
+                self._sessions[gap] = conversation_sessions(self.df, gap)
+        return self._sessions[gap]
+
+    def reply_graph(self, window=REPLY_WINDOW, start=None, end=None):
+        """
+        ReplyGraph of the chat, or of the messages between start and end (dates, both included),
+        kept for every window like sessions
+        """
+        if start is not None or end is not None:
+            return ReplyGraph(self.period_rows(start, end), window)
+        if window not in self._reply_graphs:
+            with instrumentation.stage("reply_graph", len(self.df)):
+                self._reply_graphs[window] = ReplyGraph(self.df, window)
+        return self._reply_graphs[window]
+
+    def token_counts(self, column="domains", start=None, end=None):
+        """
+        token_counts of the link domains or emoji of the chat, or of the messages between start and end
+        (dates, both included), kept for the whole chat like sessions
+        """
+        if start is not None or end is not None:
+            return token_counts(self.period_rows(start, end), column)
+        if column not in self._token_counts:
+            with instrumentation.stage("token_counts", len(self.df)):
+                self._token_counts[column] = token_counts(self.df, column)
+        return self._token_counts[column]
+
+    def period_rows(self, start=None, end=None):
+        """
+        The messages between start and end (dates, both included), a slice of the chat since it is sorted by date_time
+        """
+        i, j = self.range_totals.day_range(start, end)
+        return self.df.iloc[self.range_totals.cum_messages[i]:self.range_totals.cum_messages[j]]
+
+    def user_summary(self, user):
+        """
+        Statistics of one user as a dict, looked up from the precomputed user_stats table
+        """
+        row = self.user_stats.index.get_loc(user)
+        return {column: self.user_stats[column].iat[row] for column in self.user_stats.columns}
+
+    def user_df(self, user):
+        """
+        Messages of one user, taken by row positions instead of scanning the user column
+        """
+        return self.df.iloc[self.user_index.get(user, np.array([], dtype=np.int64))]
+
+    def longest_message(self, user=None):
+        """
+        The longest message of one user, or of the whole group when user is None (the first one if there are several)
+        """
+        if user is None:
+            return self.df["message"].iat[int(self.df["len_message"].values.argmax())]
+        return self.df["message"].iat[self.user_stats.at[user, "longest_message"]]
+
+    def append(self, new_df, tokens=None):
+        """
+        Appends the messages of new_df to the chat. The tables that were already built are updated in place
+        from the new messages only, the others are still built from the whole chat on first use.
+        tokens is the TokenStore of the messages of new_df, if it was filled while parsing them
+
+        Example:
+          tokens = TokenStore()
+          chat.append(parse_records(new_records, "Format1", tokens=tokens), tokens)
+        """
+        if len(new_df) == 0:
+            return
+        offset = len(self.df)
+        in_order = offset == 0 or new_df["date_time"].iat[0] >= self.df["date_time"].iat[-1]
+        self.df = append_chat(self.df, new_df)
+        self._histories.clear()  # rebuilt from the updated cube
+        self._sessions.clear()
+        self._reply_graphs.clear()
+        self._token_counts.clear()
+        self.__dict__.pop("range_totals", None)  # cheap to recompute from the whole chat
+        if not in_order:  # the old rows have moved, so every table is built again on first use
+            for name in ["cube", "user_index", "user_stats", "tokens"]:
+                self.__dict__.pop(name, None)
+            return
+        new_df = self.df.iloc[offset:]
+
+        if "cube" in self.__dict__:
+            # only the cells of the hour the old chat ended in can be in both cubes
+            cube = pd.concat([self.cube, activity_cube(new_df)], ignore_index=True)
+            cube["user"] = cube["user"].astype(self.df["user"].dtype)
+            cube = cube.groupby(["user", "date", "hour"], observed=True, sort=True).agg(
+                message_count=("message_count", "sum"), day_t=("day_t", "first")).reset_index()
+            cube["message_count"] = cube["message_count"].astype("int32")
+            self.cube = cube
+
+        if "user_index" in self.__dict__:
+            for user, positions in user_index(new_df).items():
+                if len(positions):
+                    positions = positions + offset
+                    old = self.user_index.get(user)
+                    self.user_index[user] = positions if old is None else np.concatenate([old, positions])
+
+        if "user_stats" in self.__dict__:
+            old, new = self.user_stats, user_stats_table(new_df)  # new_df keeps the row labels of the whole chat
+            both = old.index.intersection(new.index)
+            a, b = old.loc[both], new.loc[both]
+            n_messages = a["n_messages"] + b["n_messages"]
+            merged = pd.DataFrame({
+                "n_messages": n_messages,
+                "n_words": a["n_words"] + b["n_words"],
+                "min_len_message": np.minimum(a["min_len_message"], b["min_len_message"]),
+                "max_len_message": np.maximum(a["max_len_message"], b["max_len_message"]),
+                "avg_len_message": (a["avg_len_message"] * a["n_messages"] + b["avg_len_message"] * b["n_messages"]) / n_messages,
+                "min_word_message": np.minimum(a["min_word_message"], b["min_word_message"]),
+                "max_word_message": np.maximum(a["max_word_message"], b["max_word_message"]),
+                "avg_words": (a["avg_words"] * a["n_messages"] + b["avg_words"] * b["n_messages"]) / n_messages,
+                # the first longest message wins, like idxmax
+                "longest_message": a["longest_message"].where(a["max_len_message"] >= b["max_len_message"], b["longest_message"]),
+            })
+            self.user_stats = pd.concat([old.drop(both), new.drop(both), merged]).sort_index()
+
+        if "tokens" in self.__dict__:
+            self.tokens.extend(tokens if tokens is not None else TokenStore(new_df["message"].values))
+
+    def appended(self, new_df, tokens=None):
+        """
+        New chat of the messages of this one followed by the ones of new_df, this chat is left as it is since it can be
+        shared (eg. by the cache of chat_cache). The tables already built are copied and updated from the new messages
+        only, see append
+
+        Example:
+          tokens = TokenStore()
+          chat = chat.appended(parse_records(new_records, "Format1", tokens=tokens), tokens)
+        """
+        chat = ParsedChat(self.df, self.key)
+        for name in ["cube", "user_stats"]:  # replaced, not changed in place, by append
+            if name in self.__dict__:
+                chat.__dict__[name] = self.__dict__[name]
+        if "user_index" in self.__dict__:
+            chat.user_index = dict(self.user_index)
+        if "tokens" in self.__dict__:
+            chat.tokens = self.tokens.copy()
+        chat.append(new_df, tokens)
+        return chat
+
+
+def compare_general_stats(chats):
+    """
+    General statistics of several chats side by side (RangeTotals.stats of the whole chat, like the analysis pages)
+
+    Parameters:
+      chats: dict of chat name -> ParsedChat
+
+    Output:
+      table: dataframe of GENERAL_STATS (rows) x chat names (columns)
+
+    Example:
+      compare_general_stats({"family": family_chat, "work": work_chat})
+    """
+    return pd.DataFrame({name: pd.Series(chat.period_stats() or {}, dtype=object) for name, chat in chats.items()},
+                        index=GENERAL_STATS)
+
+
+def compare_daily_counts(chats):
+    """
+    Number of messages per day of several chats, for a stacked activity chart
+
+    Output:
+      table: dataframe of dates (rows, every day between the first and the last message) x chat names (columns)
+    """
+    daily = pd.DataFrame({name: cube_daily_counts(chat.cube) for name, chat in chats.items()})
+    if daily.empty:
+        return daily
+    return daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D")).fillna(0).astype("int64")
+
+
+def combined_top_n_user(chats, n=10):
+    """
+    Most messaged users across several chats (a user is matched by name in every chat)
+
+    Output:
+      table: dataframe of the top n users (rows) x chat names (columns) with their message counts, and the total column
+    """
+    counts = pd.DataFrame({name: cube_counts(chat.cube, "user").rename(index=str) for name, chat in chats.items()})
+    counts = counts.fillna(0).astype("int64")
+    counts["total"] = counts.sum(axis=1)
+    return counts.sort_values("total", ascending=False, kind="stable").head(n)
+
+
+def daily_conversation_graph(df, level="auto"):
+    """
+    Create a line plot about number of messages based days (or weeks or months, see history_pyramid)
+
+    Parameters:
+        df: preprocessed group chat dataframe
+        level: "day", "week", "month" or "auto" for the finest one that is not too dense for the plot
+    """
+
+    # grouping by date; since plot is of frequency of messages --> no. of messages / day (or week or month).
+    pyramid = history_pyramid(df.groupby('date').size())
+    if level == "auto":
+        level = history_level(pyramid)
 
     # Improving Default Styles using Seaborn
     sns.set_style("darkgrid")
@@ -175,16 +1910,14 @@ def daily_conversation_graph(df):
     matplotlib.rcParams['figure.figsize'] = (27, 6)
 
     # plot
-    plt.plot(df1.date, df1.message_count)
-    plt.title('Messages sent per day over a time period');
+    plt.plot(pyramid[level].index, pyramid[level].values)
+    plt.title('Messages sent per {} over a time period'.format(level));
 
 def top_n_days(df, n = 10):
     """
     most messaged days table
     """
-    df2 = df.copy()
-    df2 = df2[["date","message_count"]]
-    df2 = df2.groupby('date').sum().reset_index()
+    df2 = df.groupby('date').size().reset_index(name="message_count")
     topndays = df2.sort_values(by="message_count", ascending=False).head(n)
     topndays.reset_index(inplace=True)
     topndays.drop(columns="index", inplace=True)
@@ -211,9 +1944,7 @@ def top_n_user(df, n = 10):
     """
     most messaged users table
     """
-    df3 = df.copy()
-    df3 = df3[["user","message_count"]]
-    df3 = df3.groupby('user').sum().reset_index()
+    df3 = df.groupby('user', observed=True).size().reset_index(name="message_count")
     topnuser = df3.sort_values(by="message_count", ascending=False).head(n)
     topnuser.reset_index(inplace=True)
     topnuser.drop(columns="index", inplace=True)
@@ -240,9 +1971,7 @@ def most_active_hours(df):
     """
     most messaged hours graph
     """
-    grouped_by_time = df.copy()
-
-    grouped_by_time = grouped_by_time.groupby('hour').sum().reset_index().sort_values(by = 'hour')
+    grouped_by_time = df.groupby('hour').size().reset_index(name="message_count")
 
     # Better Readablity
     import matplotlib
@@ -260,9 +1989,7 @@ def most_active_weekdays(df):
     """
     most messaged weekdays
     """
-    grouped_by_dayt = df.copy()
-
-    grouped_by_dayt = grouped_by_dayt.groupby('day_t').sum().reset_index().sort_values(by = 'day_t')
+    grouped_by_dayt = df.groupby('day_t', observed=True).size().reset_index(name="message_count")
 
     # Better Readablity
     import matplotlib
@@ -273,7 +2000,7 @@ def most_active_weekdays(df):
     sns.set_style("darkgrid")
 
     # PLOT: grouped by hour
-    sns.barplot(grouped_by_dayt.day_t, grouped_by_dayt.message_count, palette="bright", order=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+    sns.barplot(grouped_by_dayt.day_t, grouped_by_dayt.message_count, palette="bright", order=DAY_NAMES)
     plt.title('Most Active Weekdays');
 
 def day_hour_heatmap(df):
@@ -288,11 +2015,11 @@ def day_hour_heatmap(df):
     # Beautifying Default Styles using Seaborn,
     sns.set_style("darkgrid")
 
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    days = DAY_NAMES
     hours = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23]
 
     # Pre-Processing by month and day,
-    grouped_by_month_and_day = df.groupby(['day_t', 'hour']).sum().reset_index()[['day_t', 'hour', 'message_count']]
+    grouped_by_month_and_day = df.groupby(['day_t', 'hour'], observed=True).size().reset_index(name="message_count")
 
     # creating a pivot table,
     pt = grouped_by_month_and_day.pivot_table(index = 'day_t', columns = 'hour', values = 'message_count').reindex(index = days, columns = hours)
@@ -301,129 +2028,48 @@ def day_hour_heatmap(df):
     sns.heatmap(pt, cmap = 'cividis');
     plt.title('Heatmap of Day of Week sent and Hour sent');
 
-def word_cloud_all(df):
+def cloud_frequencies(counts, stopwords=CLOUD_STOPWORDS):
     """
-    word cloud for all messages
+    Word counts without the stopwords and numbers, as they are drawn in the word cloud
     """
-    import nltk
-    from nltk.corpus import stopwords
-
-    comment_words = ' '
+    return {word: count for word, count in counts.items() if word not in stopwords and not word.isdigit()}
 
-    stopwords = STOPWORDS.update(["bi", "us", "j", "us02web", "silindi", "com", "www",
-                                  "ya", "ile", 'medya', 'dahil', 'edilmedi', 'zoom',
-                                  'https', "ama", "bu", "da", "mi", "gibi", "için", "ve", "de"])
 
-    # iterate through the DataFrame.
-    for val in df.message.values:
-        # typecaste each val to string.
-        val = str(val)
-        # split the value.
-        tokens = val.split()
-        # Converts each token into lowercase.
-        for i in range(len(tokens)):
-            tokens[i] = tokens[i].lower()
-        for words in tokens:
-            comment_words = comment_words + words + ' '
-
-    wordcloud = WordCloud(width = 1200, height = 800,
+def word_cloud_frequencies(counts, width=1200, height=800, stopwords=CLOUD_STOPWORDS):
+    """
+    word cloud from already counted words (see TokenStore.frequencies)
+    """
+    wordcloud = WordCloud(width = width, height = height,
                     background_color ='white',
-                    stopwords = stopwords,
-                    min_font_size = 8).generate(comment_words)
+                    min_font_size = 8).generate_from_frequencies(cloud_frequencies(counts, stopwords))
 
     return wordcloud.to_image()
 
-def txtToDf_inputpage(chat_file, time_format):
+def word_cloud_all(df):
+    """
+    word cloud for all messages
+    """
+    return word_cloud_frequencies(TokenStore(df.message.values).frequencies())
+
+def txtToDf_inputpage(chat_file, time_format="auto"):
     """
     Converting the txt file that exported from WhatsApp to pandas dataframe
 
     Parameters:
-      chat_file: the group chat that has been exported and will be analyzed.
-      time_format: the time format of the export that changes according to the phone language and model. This code contains 2 formats.
+      chat_file: the group chat that has been exported and will be analyzed, as decoded text, bytes or an uploaded file object.
+      time_format: the time format of the export that changes according to the phone language and model.
+        "auto" detects it from the first lines, the known formats are in DATETIME_FORMATS, eg.
         * Format1: DD.MM.YYYY HH:MM
         * Format2: DD/MM/YYYY, HH:MM
+        * Format3: [DD.MM.YYYY HH:MM:SS]
 
     Output:
       df: preprocessed dataframe
 
     Example:
-      df = txtToDf("groupchat.txt", "Format1")
+      df = txtToDf_inputpage(uploaded_file.getvalue(), "Format1")
     """
+    if isinstance(chat_file, str):  # already decoded content, not a path
+        chat_file = io.StringIO(chat_file)
 
-    # Depending on date format of exported txt file
-    split_formats = {
-        "Format1": "\d{1,2}.\d{1,2}.\d{2,4}\s\d{1,2}:\d{2}\s-\s",  # DD.MM.YYYY HH:MM
-        "Format2": "\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s",  # DD/MM/YYYY, HH:MM
-        "Format3": "\[\d{1,2}.\d{1,2}.\d{2,4}\s\d{1,2}:\d{2}:\d{2}\]\s" #[DD.MM.YYYY, HH:MM:SS]
-    }
-
-
-    raw_string = " ".join(chat_file.split( "\n"))  # converting the list split by newline char. as one whole string as there can be multi-line messages
-    user_msg = re.split(split_formats[time_format], raw_string)[1:]  # splits at all the date-time pattern, resulting in list of all the messages with user names
-    date_time = re.findall(split_formats[time_format], raw_string)  # finds all the date-time patterns
-
-    df = pd.DataFrame({"date_time": date_time, "user_msg": user_msg})  # exporting it to a df
-
-    # split user and msg
-    usernames = []
-    messages = []
-    for i in df["user_msg"]:
-        a = re.split("([\w\W]+?):\s",
-                     i)  # lazy pattern match to first {user_name}: pattern and spliting it aka each msg from a user
-        if (a[1:]):  # user typed messages
-            usernames.append(a[1])
-            messages.append(a[2])
-        else:  # other notifications in the group(eg: someone was added, some left ...)
-            usernames.append("group_notification")
-            messages.append(a[0])
-
-
-
-    # creating new columns
-    df["user"] = usernames
-    df["message"] = messages
-
-    # replace links
-    df['message'] = df['message'].replace(r'http\S+', '', regex=True).replace(r'www\S+', '', regex=True)
-
-    df["len_message"] = df["message"].str.len()  # length of messages (by char)
-    df["n_words"] = df["message"].str.split().str.len()  # number of words in a message
-
-    # format for converting date_time variable to type datetime
-    if time_format == "Format1":
-        datetime_format = "%d.%m.%Y %H:%M - "
-    elif time_format == "Format2":
-        datetime_format = "%d/%m/%Y, %H:%M - "
-    elif time_format == "Format3":
-        datetime_format = "[%d.%m.%Y %H:%M:%S] "
-
-    # converting date-time pattern which is of type String to type datetime
-    df["date_time"] = pd.to_datetime(df["date_time"], format=datetime_format)  # ex. 2022-09-20 22:10:00
-
-    # generating new time variables
-    df["date"] = df["date_time"].apply(lambda x: x.date())  # ex. 2022-09-20
-    df["year"] = df["date_time"].dt.year  # ex. 2022
-    df['month_n'] = df['date_time'].dt.month  # month_numeric ex. 8
-    df["month_t"] = df["date_time"].dt.strftime("%b")  # month_text ex. Mar
-    df["day_n"] = df["date_time"].dt.day  # day_numeric ex. 14
-    df["day_of_week"] = df["date_time"].dt.weekday + 1  # for Mon: 1 - Sun: 7 (org. Mon: 0 - Sun: 6)
-    df["day_t"] = df["date_time"].dt.strftime("%a")  # day_text, ex. Tue
-    df["time"] = df["date_time"].apply(lambda x: x.time())  # ex. 22:10:00
-    df["hour"] = df["date_time"].apply(lambda x: x.hour)  # ex. 22
-    df['minute'] = df['date_time'].dt.minute  # ex. 08
-
-    # dropping the old user_msg column.
-    df.drop("user_msg", axis=1, inplace=True)
-    # dropping the empty messages
-    df = df[df['message'] != ""].reset_index(drop=True)
-    # dropping "medya dahil edilmedi" messages
-    df = df[df["message"] != "<medya dahil edilmedi>"].reset_index(drop=True)
-    df = df[df["message"] != "<Medya dahil edilmedi>"].reset_index(drop=True)
-
-    # dropping group_notification messages
-    df = df[df['user'] != "group_notification"].reset_index(drop=True)
-
-    # adding extra helper column --> message_count
-    df['message_count'] = [1] * df.shape[0]
-
-    return df
+    return parse_chat(chat_file, time_format)
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from collections import deque
+import pandas as pd
+
+# instrumentation is enabled by setting this environment variable (eg. CHAT_PROFILE=1) or with enable(),
+# CHAT_PROFILE=time records only the times, as tracing the memory makes the parse a few times slower
+ENV_VAR = "CHAT_PROFILE"
+
+# number of the latest stage records that are kept for recent_records()
+RECENT_SIZE = 1000
+
+logger = logging.getLogger("whatsapp_chat_analysis.stages")
+
+_enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+_memory = os.environ.get(ENV_VAR, "") != "time"
+_local = threading.local()  # stack of open stages and active collectors of each thread
+_recent = deque(maxlen=RECENT_SIZE)
+
+
+class _NullStage:
+    """
+    Stage of the disabled instrumentation, the same object every time so a disabled stage costs one call
+    """
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """
+    Wall time, rows and peak allocated memory of one stage of the pipeline (see stage)
+    """
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows  # can be set inside the with block, eg. to the number of rows the stage produced
+        self.seconds = None
+        self.peak_mb = None
+
+    def __enter__(self):
+        stack = _stack()
+        self._traced = tracemalloc.is_tracing()
+        if self._traced:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1]._traced:  # the peak reached so far belongs to the enclosing stage
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory, self._peak = current, current
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        stack = _stack()
+        stack.pop()
+        if self._traced and tracemalloc.is_tracing():
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak_mb = (self._peak - self._start_memory) / 2 ** 20
+            if stack and stack[-1]._traced:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+
+        record = self.record()
+        _recent.append(record)
+        for collected in getattr(_local, "collectors", []):
+            collected.append(record)
+        logger.info(json.dumps(record))
+        return False
+
+    def record(self):
+        return {"stage": self.name, "seconds": round(self.seconds, 6), "rows": self.rows,
+                "peak_mb": None if self.peak_mb is None else round(self.peak_mb, 3), "depth": len(_stack())}
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _log_to_stderr():
+    """
+    Writes the stage records of the logger as lines on stderr, unless handlers were already set up for it
+    (without a handler the INFO records would be dropped by the last resort handler of logging)
+    """
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+
+def enable(enabled=True, memory=True):
+    """
+    Turns the instrumentation on (or off) and logs the stages (see _log_to_stderr). Peak memory is measured with
+    tracemalloc, which is started here unless memory is False
+
+    Example:
+      enable()
+      df = functions.parse_chat("groupchat.txt")
+    """
+    global _enabled, _memory
+    _enabled, _memory = enabled, memory
+    if enabled:
+        _log_to_stderr()
+    if enabled and memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+if _enabled:
+    _log_to_stderr()
+
+
+def is_enabled():
+    return _enabled
+
+
+def stage(name, rows=None):
+    """
+    Context manager that records the wall time, rows and peak allocated memory of a stage of the pipeline.
+    Every finished stage is logged as one JSON line on the "whatsapp_chat_analysis.stages" logger.
+    When the instrumentation is disabled it does nothing
+
+    Parameters:
+      name: name of the stage, eg. "to_datetime"
+      rows: number of rows the stage works on, can also be set later as stage.rows
+
+    Example:
+      with stage("to_datetime", len(df)):
+          df["date_time"] = pd.to_datetime(df["date_time"])
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    if _memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return Stage(name, rows)
+
+
+class collect:
+    """
+    Collects the records of the stages that finish on this thread while it is started
+
+    Example:
+      with collect() as records:
+          df = functions.parse_chat("groupchat.txt")
+      summary(records)
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def start(self):
+        if not hasattr(_local, "collectors"):
+            _local.collectors = []
+        _local.collectors.append(self.records)
+        return self
+
+    def stop(self):
+        collectors = getattr(_local, "collectors", [])
+        for i, records in enumerate(collectors):
+            if records is self.records:
+                del collectors[i]
+                break
+        return self.records
+
+    def __enter__(self):
+        return self.start().records
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def recent_records():
+    """
+    The latest stage records of every thread, oldest first
+    """
+    return list(_recent)
+
+
+def summary(records):
+    """
+    Table of the stages in the order they first ran, with the total seconds and rows and the highest peak memory
+    of each stage (a stage runs once per batch of messages)
+
+    Example:
+      summary(records).sort_values("seconds", ascending=False)
+    """
+    columns = ["stage", "calls", "seconds", "rows", "peak_mb"]
+    if not records:
+        return pd.DataFrame(columns=columns)
+    table = pd.DataFrame(records).groupby("stage", sort=False).agg(
+        calls=("seconds", "size"), seconds=("seconds", "sum"), rows=("rows", "sum"), peak_mb=("peak_mb", "max"))
+    return table.reset_index()[columns]